@@ -0,0 +1,214 @@
+import json
+import os
+import re
+import subprocess
+import wave
+import numpy as np
+import tracing
+
+SAMPLE_RATE = 24000  # gTTS output rate, so decoding loses nothing
+FRAME_SECONDS = 0.02
+SILENCE_DB_BELOW_SPEECH = 35  # Frames this far below the loud (95th percentile) level count as silence
+SILENCE_FLOOR_DB = -60
+MAX_PAUSE = 0.35  # Longer pauses are shortened to this
+LEAD_SILENCE = 0.1
+TAIL_SILENCE = 0.3
+PHRASE_PAUSE = 0.15  # A pause at least this long separates two spoken phrases
+SNAP_SECONDS = 0.6  # Phrase boundaries this close to a real pause are moved onto it
+SENTENCE_END = re.compile(r"[.!?][\"')\]]*$")
+
+def settings():
+    """ Everything that changes the analysis output, for cache keys """
+    return {"sample_rate": SAMPLE_RATE, "frame": FRAME_SECONDS, "below": SILENCE_DB_BELOW_SPEECH,
+            "floor": SILENCE_FLOOR_DB, "max_pause": MAX_PAUSE, "lead": LEAD_SILENCE, "tail": TAIL_SILENCE,
+            "phrase_pause": PHRASE_PAUSE}
+
+def decode_pcm(audio_file, pcm_file=None, sample_rate=SAMPLE_RATE):
+    """ Decode audio once to raw mono 16-bit PCM on disk and memory-map it """
+    if pcm_file is None:
+        pcm_file = os.path.splitext(audio_file)[0] + ".pcm"
+    command = ["ffmpeg", "-v", "error", "-y", "-i", audio_file,
+               "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(sample_rate), pcm_file]
+    process = tracing.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command, process.stdout, process.stderr)
+    if os.path.getsize(pcm_file) == 0:
+        return np.zeros(0, dtype=np.int16)
+    return np.memmap(pcm_file, dtype=np.int16, mode="r")
+
+def frame_levels(samples, sample_rate=SAMPLE_RATE, frame_seconds=FRAME_SECONDS):
+    """ RMS level of each frame in dBFS """
+    frame_length = max(int(sample_rate * frame_seconds), 1)
+    count = len(samples) // frame_length
+    frames = np.asarray(samples[:count * frame_length], dtype=np.float32).reshape(count, frame_length)
+    rms = np.sqrt(np.mean(np.square(frames / 32768.0), axis=1))
+    return 20 * np.log10(rms + 1e-10)
+
+def silent_runs(levels):
+    """ (first_frame, end_frame) of every run of silent frames """
+    if len(levels) == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+    threshold = max(np.percentile(levels, 95) - SILENCE_DB_BELOW_SPEECH, SILENCE_FLOOR_DB)
+    silent = np.concatenate(([0], (levels < threshold).astype(np.int8), [0]))
+    edges = np.diff(silent)
+    return np.stack([np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)], axis=1)
+
+def plan_cuts(silences, duration):
+    """
+    Seconds to remove: leading/trailing silence beyond LEAD_SILENCE/TAIL_SILENCE, and the middle of every
+    inner pause longer than MAX_PAUSE. Returns [(start, end)] in source time.
+    """
+    cuts = []
+    for start, end in silences:
+        if start <= 0:
+            cut = (0.0, end - LEAD_SILENCE)
+        elif end >= duration:
+            cut = (start + TAIL_SILENCE, duration)
+        else:
+            excess = (end - start) - MAX_PAUSE
+            cut = (start + MAX_PAUSE / 2, start + MAX_PAUSE / 2 + excess)
+        if cut[1] - cut[0] > FRAME_SECONDS:
+            cuts.append(cut)
+    return cuts
+
+def kept_ranges(cuts, duration):
+    """ [(source_start, source_end, output_start)] of the audio that stays """
+    ranges, position, output = [], 0.0, 0.0
+    for start, end in cuts:
+        if start > position:
+            ranges.append((position, start, output))
+            output += start - position
+        position = max(position, end)
+    if duration > position:
+        ranges.append((position, duration, output))
+    return ranges
+
+def map_times(times, ranges):
+    """ Source times -> output times (times inside a cut land on the cut point) """
+    times = np.asarray(times, dtype=np.float64)
+    if not ranges:
+        return np.zeros_like(times)
+    starts = np.array([r[0] for r in ranges])
+    ends = np.array([r[1] for r in ranges])
+    outputs = np.array([r[2] for r in ranges])
+    index = np.clip(np.searchsorted(starts, times, side="right") - 1, 0, len(ranges) - 1)
+    return outputs[index] + np.clip(times - starts[index], 0, ends[index] - starts[index])
+
+def write_wav(samples, ranges, output_file, sample_rate=SAMPLE_RATE):
+    """ Write the kept ranges of the PCM back to back as a WAV file """
+    tmp_file = f"{output_file}.{os.getpid()}.tmp.wav"
+    with wave.open(tmp_file, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        for start, end, _ in ranges:
+            wav.writeframes(np.ascontiguousarray(samples[int(start * sample_rate):int(end * sample_rate)]).tobytes())
+    os.replace(tmp_file, output_file)
+
+def analyze_voiceover(audio_file, output_file, timing_file=None, sample_rate=SAMPLE_RATE):
+    """
+    Decode the voiceover once, compress long silences, and find where speech actually happens.
+    Writes the trimmed audio to output_file (WAV) and returns the timing map
+    {"duration", "source_duration", "speech": [[start, end], ...], "kept": [[src_start, src_end, start], ...]}
+    in trimmed-audio time, also saved to timing_file as JSON if given.
+    """
+    print("📈 Analyzing voiceover...")
+    pcm_file = f"{output_file}.{os.getpid()}.pcm"
+    try:
+        samples = decode_pcm(audio_file, pcm_file, sample_rate)
+        source_duration = len(samples) / sample_rate
+
+        levels = frame_levels(samples, sample_rate)
+        silences = silent_runs(levels) * FRAME_SECONDS
+        silences[silences[:, 1] >= len(levels) * FRAME_SECONDS, 1] = source_duration  # Tail past the last frame
+
+        ranges = kept_ranges(plan_cuts(silences, source_duration), source_duration)
+        write_wav(samples, ranges, output_file, sample_rate)
+        del samples
+    finally:
+        if os.path.exists(pcm_file):
+            os.remove(pcm_file)
+
+    duration = sum(end - start for start, end, _ in ranges)
+
+    # Speech spans are what lies between pauses long enough to separate phrases
+    pauses = [(start, end) for start, end in silences if end - start >= PHRASE_PAUSE]
+    bounds = [0.0] + [t for pause in pauses for t in pause] + [source_duration]
+    spans = [(bounds[i], bounds[i + 1]) for i in range(0, len(bounds), 2) if bounds[i + 1] - bounds[i] > 0]
+    mapped = map_times(np.array(spans).reshape(-1), ranges).reshape(-1, 2) if spans else np.zeros((0, 2))
+    speech = [[round(float(start), 3), round(float(end), 3)] for start, end in mapped if end > start]
+
+    timing_map = {
+        "duration": round(float(duration), 3),
+        "source_duration": round(float(source_duration), 3),
+        "speech": speech,
+        "kept": [[round(float(value), 3) for value in kept] for kept in ranges],
+    }
+
+    if timing_file:
+        with open(timing_file, "w", encoding="utf-8") as f:
+            json.dump(timing_map, f, indent=2)
+
+    print(f"✅ Voiceover trimmed from {source_duration:.1f}s to {duration:.1f}s ({len(speech)} spoken phrases)")
+    return timing_map
+
+def snap_to_pauses(clock, pauses):
+    """ Move boundaries within SNAP_SECONDS of a pause (in speaking time) onto it, keeping the ends fixed """
+    if len(pauses) == 0 or len(clock) < 3:
+        return clock
+    nearest = pauses[np.clip(np.searchsorted(pauses, clock), 0, len(pauses) - 1)]
+    previous = pauses[np.clip(np.searchsorted(pauses, clock) - 1, 0, len(pauses) - 1)]
+    nearest = np.where(np.abs(previous - clock) < np.abs(nearest - clock), previous, nearest)
+    snapped = np.where(np.abs(nearest - clock) <= SNAP_SECONDS, nearest, clock)
+    snapped[0], snapped[-1] = clock[0], clock[-1]
+    return np.maximum.accumulate(snapped)
+
+def align_phrases(phrase_texts, timing_map, min_duration=1.0):
+    """
+    Place phrases on the measured speech: text is spread over speaking time (pauses excluded) in proportion
+    to its length, and a phrase boundary near a real pause is moved onto it.
+    Sentence ends that land on a pause become anchors and the phrases between two anchors are laid out again
+    within them, so editing one sentence leaves the relative timing of every other sentence untouched.
+    Returns [(start_time, text, duration)] like split_text_with_voice_timing.
+    """
+    speech = np.array(timing_map.get("speech") or [[0.0, timing_map.get("duration", 0.0)]], dtype=np.float64)
+    if not phrase_texts or len(speech) == 0:
+        return []
+
+    lengths = speech[:, 1] - speech[:, 0]
+    span_clock = np.concatenate(([0.0], np.cumsum(lengths)))  # Speaking time at the start of each span
+    total = span_clock[-1]
+    pauses = span_clock[1:-1]
+
+    weights = np.array([len(text.replace(" ", "")) + 1 for text in phrase_texts], dtype=np.float64)
+    clock = snap_to_pauses(np.concatenate(([0.0], np.cumsum(weights) / weights.sum() * total)), pauses)
+
+    anchors = [0] + [i for i in range(1, len(phrase_texts))
+                     if SENTENCE_END.search(phrase_texts[i - 1]) and np.isin(clock[i], pauses)] + [len(phrase_texts)]
+    for first, last in zip(anchors, anchors[1:]):
+        start, end = clock[first], clock[last]
+        local = np.concatenate(([0.0], np.cumsum(weights[first:last]))) / weights[first:last].sum()
+        inside = pauses[(pauses > start) & (pauses < end)]
+        clock[first:last + 1] = snap_to_pauses(start + local * (end - start), inside)
+
+    def to_time(values, side):
+        # A boundary exactly between spans starts the next span but ends the previous one
+        index = np.clip(np.searchsorted(span_clock, values, side=side) - 1, 0, len(speech) - 1)
+        return speech[index, 0] + (values - span_clock[index])
+
+    starts = to_time(clock[:-1], "right")
+    ends = to_time(clock[1:], "left")
+    next_starts = np.append(starts[1:], timing_map.get("duration", ends[-1]))
+
+    phrases = []
+    for text, start, end, next_start in zip(phrase_texts, starts, ends, next_starts):
+        duration = max(end - start, min(min_duration, next_start - start))
+        phrases.append((round(float(start), 3), text, round(float(duration), 3)))
+    return phrases
+
+def load_timing_map(timing_file):
+    """ Read a timing map written by analyze_voiceover, or None """
+    if not timing_file or not os.path.exists(timing_file):
+        return None
+    with open(timing_file, "r", encoding="utf-8") as f:
+        return json.load(f)
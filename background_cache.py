@@ -0,0 +1,74 @@
+import os
+import subprocess
+import sys
+import stage_cache
+import tracing
+
+NORMALIZED_DIR = os.path.join("cache", "normalized")
+# Disk budget for normalized clips; least recently used ones are evicted beyond this
+MAX_BYTES = int(os.environ.get("NORMALIZED_CACHE_MAX_BYTES", 10 * 1024 ** 3))
+
+def source_identity(input_file):
+    """ Cheap identity of a source clip: a replaced or re-downloaded file gets a new one, without reading it """
+    stat = os.stat(input_file)
+    return f"{os.path.abspath(input_file)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+def normalized_key(input_file, height=720, fps=24, pix_fmt="yuv420p", source_hash=None):
+    """
+    Cache key for a source clip normalized to the given height, fps and pixel format. Keyed on the clip's
+    content hash when the caller already has one (the video library stores download.file_sha256 of every clip),
+    otherwise on its path, size and mtime.
+    """
+    source = f"sha256:{source_hash}" if source_hash else source_identity(input_file)
+    return stage_cache.stage_key("normalized", source=source, height=height, fps=fps, pix_fmt=pix_fmt)
+
+def normalize_background(input_file, height=720, fps=24, pix_fmt="yuv420p", cache_dir=NORMALIZED_DIR,
+                         source_hash=None, max_bytes=MAX_BYTES):
+    """
+    Return a copy of input_file scaled to `height`, resampled to `fps` and converted to `pix_fmt`,
+    transcoding it only the first time the clip is seen. Safe to call from several processes at once:
+    one transcodes while the others wait for the result. The cache is bounded by max_bytes (LRU).
+    Returns input_file if the transcode fails.
+    """
+    if not os.path.exists(input_file) or os.path.getsize(input_file) < 1000:
+        print("❌ Input video file is missing or too small. Skipping resize.")
+        return input_file
+
+    key = normalized_key(input_file, height, fps, pix_fmt, source_hash)
+    output_file = stage_cache.lookup(key, cache_dir)
+    if output_file:
+        return output_file
+
+    with stage_cache.KeyLock(key, cache_dir):
+        # Another process may have finished the same clip while we waited for the lock
+        output_file = stage_cache.lookup(key, cache_dir)
+        if output_file:
+            return output_file
+
+        print("📏 Normalizing background using FFmpeg...")
+        tmp_file = stage_cache.temp_path(key, ".mp4", cache_dir)
+        command = [
+            "ffmpeg", "-y", "-i", input_file,
+            "-vf", f"scale=trunc(iw/2)*2:{height},fps={fps}",
+            "-pix_fmt", pix_fmt,
+            "-c:v", "libx264", "-preset", "ultrafast",
+            "-an",
+            tmp_file
+        ]
+        with tracing.span("resize", height=height, fps=fps):
+            tracing.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        if os.path.exists(tmp_file) and os.path.getsize(tmp_file) > 1000:
+            output_file = stage_cache.commit(key, tmp_file, cache_dir, max_bytes=max_bytes)
+            print(f"✅ Normalized background saved as {output_file}")
+            return output_file
+
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        print("⚠ Normalizing failed.")
+        return input_file
+
+if __name__ == "__main__":
+    # Pre-fill the cache: python background_cache.py clip1.mp4 clip2.mp4 ...
+    for path in sys.argv[1:]:
+        normalize_background(path)
@@ -0,0 +1,124 @@
+import os
+import subprocess
+import numpy as np
+from media import probe_media, scaled_width
+
+def make_seamless_loop(input_file, crossfade, output_file=None):
+    """
+    Write a version of input_file whose last `crossfade` seconds dissolve into its first frames, so looping it
+    has no visible seam. Made once per clip and crossfade length; returns input_file if it fails.
+    """
+    if output_file is None:
+        output_file = f"{os.path.splitext(input_file)[0]}_loop{crossfade:g}.mp4"
+    if os.path.exists(output_file):
+        return output_file
+
+    _, _, duration = probe_media(input_file)
+    if duration <= 2 * crossfade:
+        return input_file
+
+    tmp_file = f"{output_file}.{os.getpid()}.tmp.mp4"
+    video_filter = (f"[0:v]split[a][b];"
+                    f"[a]trim=start={crossfade},setpts=PTS-STARTPTS[body];"
+                    f"[b]trim=end={crossfade},setpts=PTS-STARTPTS[head];"
+                    f"[body][head]xfade=transition=fade:duration={crossfade}:offset={duration - 2 * crossfade:.3f}[v]")
+    command = [
+        "ffmpeg", "-y", "-i", input_file,
+        "-filter_complex", video_filter, "-map", "[v]", "-an",
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+        tmp_file
+    ]
+    subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    if os.path.exists(tmp_file) and os.path.getsize(tmp_file) > 1000:
+        os.replace(tmp_file, output_file)
+        return output_file
+
+    print("⚠ Crossfade loop failed, looping without it.")
+    return input_file
+
+class LoopedFrameReader:
+    """
+    One continuous stream of RGB frames from an ffmpeg process that loops (-stream_loop) and trims the
+    background itself. Frames are read in order from a pipe, so memory stays flat and loop boundaries cost
+    nothing; a backwards seek restarts the stream at the right offset.
+    """
+
+    def __init__(self, path, duration, fps=24, height=None):
+        self.path = path
+        self.duration = duration
+        self.fps = fps
+
+        src_width, src_height, self.source_duration = probe_media(path)
+        if height and src_height:
+            self.width, self.height = scaled_width(src_width, src_height, height), height
+        else:
+            self.width, self.height = src_width, src_height
+        self.frame_bytes = self.width * self.height * 3
+
+        self.process = None
+        self.position = -1  # Index of the frame in self.last_frame
+        self.last_frame = None
+
+    def start(self, frame_index=0):
+        """ (Re)start the ffmpeg pipe so the next frame read is frame_index """
+        self.close()
+        start = frame_index / self.fps
+        offset = start % self.source_duration if self.source_duration > 0 else 0
+        command = [
+            "ffmpeg", "-v", "error",
+            "-ss", f"{offset:.6f}", "-stream_loop", "-1", "-i", self.path,
+            "-t", f"{max(self.duration - start, 0) + 1:.3f}",
+            "-vf", f"scale={self.width}:{self.height},fps={self.fps}",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-"
+        ]
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                        bufsize=self.frame_bytes * 4)
+        self.position = frame_index - 1
+
+    def read_next(self):
+        data = self.process.stdout.read(self.frame_bytes)
+        if len(data) < self.frame_bytes:
+            # Past the end of the stream: hold the last frame
+            return self.last_frame if self.last_frame is not None else np.zeros((self.height, self.width, 3), np.uint8)
+        self.position += 1
+        self.last_frame = np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 3)
+        return self.last_frame
+
+    def get_frame(self, t):
+        """ Frame at time t; sequential access just reads the next frame off the pipe """
+        index = int(t * self.fps + 1e-6)
+        if index == self.position and self.last_frame is not None:
+            return self.last_frame
+
+        if self.process is None or index < self.position or index > self.position + self.fps * 5:
+            self.start(index)
+
+        frame = self.last_frame
+        while self.position < index:
+            before = self.position
+            frame = self.read_next()
+            if self.position == before:
+                break
+        return frame
+
+    def close(self):
+        if self.process is not None:
+            self.process.stdout.close()
+            self.process.terminate()
+            self.process.wait()
+            self.process = None
+
+def looped_background_clip(path, duration, fps=24, height=None, crossfade=0.0):
+    """
+    moviepy clip of the background looped/trimmed to `duration` in the decode stage.
+    Returns (clip, reader); close the reader when rendering is done.
+    """
+    from moviepy.video.VideoClip import VideoClip
+
+    if crossfade > 0:
+        path = make_seamless_loop(path, crossfade)
+
+    reader = LoopedFrameReader(path, duration, fps=fps, height=height)
+    clip = VideoClip(reader.get_frame, duration=duration).set_fps(fps)
+    return clip, reader
@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from fetch_story import get_top_stories
+from story_dedup import DedupIndex, find_duplicate, remember_story
+from story_store import mark_used, pick_stories
+
+RESULTS_DIR = "results"
+BATCH_DIR = os.path.join(RESULTS_DIR, "batch")
+THREADS_PER_JOB = 4  # Each job's encoder gets this many cores by default; jobs = cores / this
+
+def ensure_dir(directory):
+    """ Ensure that a directory exists """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+def run_job(job):
+    """ Run the full pipeline for one story inside its own job directory """
+    from master_script import run_pipeline
+
+    # Jobs share the machine: cap this job's encoders (and their stage workers, which inherit it) to its share
+    os.environ["RENDER_THREADS"] = str(job["threads"])
+    started = time.time()
+    try:
+        # Duplicates were already filtered out before the jobs were dispatched
+        final_video = run_pipeline(story=job["text"], subreddit=job["subreddit"], title=job["title"],
+                                   job_dir=job["job_dir"], story_id=job["id"], check_duplicates=False)
+        error = None if final_video else "render failed"
+    except Exception as e:
+        final_video, error = None, str(e)
+
+    return {
+        "id": job["id"],
+        "subreddit": job["subreddit"],
+        "title": job["title"],
+        "job_dir": job["job_dir"],
+        "final_video": final_video,
+        "ok": final_video is not None,
+        "error": error,
+        "seconds": round(time.time() - started, 2),
+    }
+
+def run_batch(subreddits, count=10, time_filter="day", workers=None, batch_dir=BATCH_DIR, from_store=False):
+    """
+    Fetch `count` top stories across `subreddits` and render one video per story in a bounded process pool.
+    With from_store=True the stories are picked from the local story store instead of the Reddit API; picking
+    reserves them, and any whose video isn't made is returned to the pool at the end.
+    """
+    cores = os.cpu_count() or 1
+    workers = workers or max(cores // THREADS_PER_JOB, 1)
+    threads = max(cores // workers, 1)
+    batch_dir = os.path.join(batch_dir, time.strftime("%Y%m%d-%H%M%S"))
+    ensure_dir(batch_dir)
+
+    if from_store:
+        print(f"📜 Picking {count} unused stories from the story store...")
+        stories = pick_stories(count, subreddits=subreddits)
+    else:
+        print(f"📜 Fetching {count} stories from {', '.join(subreddits)} ({time_filter})...")
+        stories = get_top_stories(subreddits, limit=count, time_filter=time_filter)
+    if not stories:
+        print("⚠ No stories found.")
+        return []
+
+    # Reposts of stories already made into videos, or of one picked earlier in this batch, are skipped. Only
+    # stories whose video gets made are added to the shared index, so a failed job can be retried later.
+    jobs, skipped = [], []
+    batch_index = DedupIndex(":memory:")
+    try:
+        for story in stories:
+            duplicate = (find_duplicate(story["text"], story["id"])
+                         or batch_index.check_and_add(story["id"], story["text"]))
+            if duplicate:
+                print(f"⏭ Skipping r/{story['subreddit']} {story['id']}: repost of {duplicate[0]} "
+                      f"({duplicate[1]:.0%} similar)")
+                skipped.append({"id": story["id"], "subreddit": story["subreddit"], "duplicate_of": duplicate[0],
+                                "similarity": round(duplicate[1], 3)})
+                continue
+            jobs.append(dict(story, job_dir=os.path.join(batch_dir, f"{story['subreddit']}_{story['id']}"),
+                             threads=threads))
+    finally:
+        batch_index.close()
+
+    print(f"🎬 Rendering {len(jobs)} videos with {workers} workers ({threads} encoder threads each)...")
+    started = time.time()
+    results = []
+    texts = {job["id"]: job["text"] for job in jobs}
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_job, job) for job in jobs]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if result["ok"]:
+                    remember_story(texts[result["id"]], result["id"])
+                status = "✅" if result["ok"] else "❌"
+                print(f"{status} [{len(results)}/{len(jobs)}] r/{result['subreddit']} {result['id']} "
+                      f"({result['seconds']}s)")
+    finally:
+        if from_store:
+            made = {result["id"] for result in results if result["ok"]}
+            unused = [job["id"] for job in jobs if job["id"] not in made]
+            if unused:
+                print(f"↩ Returning {len(unused)} stories without a video to the story store")
+                mark_used(unused, used=False)
+
+    report = {
+        "subreddits": list(subreddits),
+        "count": count,
+        "time_filter": time_filter,
+        "workers": workers,
+        "threads_per_job": threads,
+        "seconds": round(time.time() - started, 2),
+        "succeeded": sum(1 for r in results if r["ok"]),
+        "failed": sum(1 for r in results if not r["ok"]),
+        "skipped_duplicates": skipped,
+        "jobs": results,
+    }
+    report_file = os.path.join(batch_dir, "report.json")
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"📊 Batch done: {report['succeeded']} succeeded, {report['failed']} failed in {report['seconds']}s")
+    print("📄 Report saved as", report_file)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render one video per top Reddit story")
+    parser.add_argument("subreddits", nargs="+", help="Subreddits to pull stories from")
+    parser.add_argument("--count", type=int, default=10, help="Number of videos to produce")
+    parser.add_argument("--time-filter", default="day", choices=["hour", "day", "week", "month", "year", "all"])
+    parser.add_argument("--workers", type=int, default=None,
+                        help=f"Parallel jobs (default: CPU count / {THREADS_PER_JOB})")
+    parser.add_argument("--from-store", action="store_true", help="Pick stories from the local story store")
+    args = parser.parse_args()
+
+    run_batch(args.subreddits, count=args.count, time_filter=args.time_filter, workers=args.workers,
+              from_store=args.from_store)
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from text_render import find_font_file, render_text
+import tracing
+
+CAPTION_CACHE_DIR = os.path.join("cache", "captions")
+MEMORY_ENTRIES = 512  # Sprites kept in memory per process
+# Disk budget for the sprite store; least recently used sprites are removed beyond it
+MAX_BYTES = int(os.environ.get("CAPTION_CACHE_MAX_BYTES", 512 * 1024 ** 2))
+PRUNE_EVERY = 64  # Sprites written by this process between checks of the budget
+DEFAULT_FONT = "Arial-Bold"  # render_text's default
+
+_memory = OrderedDict()
+_lock = threading.Lock()
+_written = 0  # Sprites this process has added to the disk store
+
+def ensure_dir(directory):
+    """ Ensure that a directory exists """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+def font_identity(font):
+    """ The font file a font name resolves to on this machine and its mtime; None means Pillow's built-in font """
+    path = find_font_file(font)
+    if path is None:
+        return None
+    try:
+        return f"{os.path.abspath(path)}:{os.stat(path).st_mtime_ns}"
+    except OSError:
+        return None
+
+def sprite_key(text, style):
+    """
+    Key for a rendered caption: the text plus every style option that changes its pixels, including which
+    font file the font name resolves to here, so installing or updating a font doesn't serve stale sprites.
+    """
+    payload = json.dumps({"text": text, "style": style, "font_file": font_identity(style.get("font", DEFAULT_FONT))},
+                         sort_keys=True, ensure_ascii=False, default=list)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+def prune(cache_dir=CAPTION_CACHE_DIR, max_bytes=MAX_BYTES):
+    """ Remove the least recently used sprites (oldest mtime; hits touch theirs) until the store fits max_bytes """
+    sprites = []
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            if not name.endswith(".npz") or name.endswith(".tmp.npz"):
+                continue  # Another process's sprite still being written
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # Removed by another process meanwhile
+            sprites.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in sprites)
+    for _, size, path in sorted(sprites):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+    return total
+
+def remember(key, sprite):
+    """ Put a sprite in the in-memory LRU, dropping the least recently used beyond MEMORY_ENTRIES """
+    with _lock:
+        _memory[key] = sprite
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_ENTRIES:
+            _memory.popitem(last=False)
+
+def get_sprite(text, cache_dir=CAPTION_CACHE_DIR, max_bytes=MAX_BYTES, **style):
+    """
+    Return the RGBA sprite for text rendered with render_text(**style), from memory, then the compressed
+    on-disk store shared by every process, rendering it only on a miss. The store is kept under max_bytes.
+    """
+    global _written
+    key = sprite_key(text, style)
+
+    with _lock:
+        sprite = _memory.get(key)
+        if sprite is not None:
+            _memory.move_to_end(key)
+            return sprite
+
+    path = os.path.join(cache_dir, key[:2], key + ".npz")
+    if os.path.exists(path):
+        try:
+            with np.load(path) as data:
+                sprite = data["sprite"]
+            os.utime(path)  # Recently used, so pruned last
+        except (OSError, ValueError, KeyError):
+            sprite = None  # Partially written or corrupt; render it again
+
+    if sprite is None:
+        with tracing.span("caption.render", chars=len(text)):
+            sprite = render_text(text, **style)
+        ensure_dir(os.path.dirname(path))
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez_compressed(tmp_path, sprite=sprite)
+        os.replace(tmp_path, path)
+
+        with _lock:
+            _written += 1
+            check = _written % PRUNE_EVERY == 0
+        if check:
+            prune(cache_dir, max_bytes)
+
+    sprite.setflags(write=False)  # Shared between clips, so nobody may draw into it
+    remember(key, sprite)
+    return sprite
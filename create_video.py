@@ -1,15 +1,32 @@
+import math
 import subprocess
 import os
 from moviepy.video.io.VideoFileClip import VideoFileClip
 from moviepy.audio.io.AudioFileClip import AudioFileClip
 from moviepy.video.fx.loop import loop
-from moviepy.editor import TextClip, CompositeVideoClip, concatenate_videoclips
+from moviepy.editor import CompositeVideoClip, concatenate_videoclips
 from moviepy.video.fx.all import fadein, fadeout  # ✅ Corrected import
 from tqdm import tqdm
+from proglog import ProgressBarLogger
 import re
+from caption_cache import get_sprite  # Pillow rasterizer, no ImageMagick subprocess per caption
+from subtitle_compositor import Overlay, SubtitleCompositor
+from background_stream import looped_background_clip
+import tracing
 
 RESULTS_DIR = "results"
 
+class FrameProgressLogger(ProgressBarLogger):
+    """ moviepy logger that passes the index of each frame write_videofile renders to a callback """
+
+    def __init__(self, on_frame):
+        super().__init__()
+        self.on_frame = on_frame
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        if bar == "t" and attr == "index":
+            self.on_frame(value + 1)
+
 def ensure_dir(directory):
     """ Ensure that a directory exists """
     if not os.path.exists(directory):
@@ -17,13 +34,29 @@ def ensure_dir(directory):
 
 ensure_dir(RESULTS_DIR)
 
-def split_text_with_voice_timing(text, audio_duration, words_per_second=2.5, gap_between_subtitles=0.2):
-    """ Splits text into phrases based on speech speed and punctuation, ensuring a minimum duration """
+def split_text_with_voice_timing(text, audio_duration, words_per_second=2.5, gap_between_subtitles=0.2,
+                                 timing_map=None):
+    """
+    Splits text into phrases based on speech speed and punctuation, ensuring a minimum duration.
+    With a timing_map from audio_analysis.analyze_voiceover, phrases are placed on the measured speech instead.
+    """
     words = text.split()
     phrases = []
     temp_phrase = []
     current_time = 0.0
 
+    if timing_map:
+        from audio_analysis import align_phrases
+        phrase_texts = []
+        for word in words:
+            temp_phrase.append(word)
+            if re.search(r"[.!?]", word) or len(temp_phrase) >= 10:
+                phrase_texts.append(" ".join(temp_phrase))
+                temp_phrase = []
+        if temp_phrase:
+            phrase_texts.append(" ".join(temp_phrase))
+        return align_phrases(phrase_texts, timing_map)
+
     for word in words:
         temp_phrase.append(word)
         if re.search(r"[.!?]", word) or len(temp_phrase) >= 10:  
@@ -38,12 +71,22 @@ def split_text_with_voice_timing(text, audio_duration, words_per_second=2.5, gap
         phrase_duration = max(len(temp_phrase) / words_per_second, 1.0)
         phrases.append((current_time, phrase_text, phrase_duration))
 
+    # Never let captions run past the voiceover: squeeze the estimate into the real duration
+    if phrases and audio_duration and phrases[-1][0] + phrases[-1][2] > audio_duration:
+        scale = audio_duration / (phrases[-1][0] + phrases[-1][2])
+        phrases = [(start * scale, phrase_text, duration * scale) for start, phrase_text, duration in phrases]
+
     return phrases
 
-def resize_video(input_file, output_file=None, height=720):
-    """ Resizes a video using FFmpeg, ensuring width is even """
+def resize_video(input_file, output_file=None, height=720, source_hash=None):
+    """
+    Resizes a video using FFmpeg, ensuring width is even.
+    Without an output_file the result comes from the shared normalized-background cache, so each
+    source clip is only transcoded once; pass the library's source_hash to find clips it pre-normalized.
+    """
     if output_file is None:
-        output_file = os.path.join(RESULTS_DIR, "resized_background.mp4")
+        from background_cache import normalize_background
+        return normalize_background(input_file, height=height, source_hash=source_hash)
 
     print("📏 Resizing video using FFmpeg...")
 
@@ -59,7 +102,8 @@ def resize_video(input_file, output_file=None, height=720):
         output_file
     ]
 
-    subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    with tracing.span("resize", height=height):
+        tracing.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
     if os.path.exists(output_file) and os.path.getsize(output_file) > 1000:
         print(f"✅ Resized video saved as {output_file}")
@@ -68,8 +112,56 @@ def resize_video(input_file, output_file=None, height=720):
         print(f"⚠ Resizing failed.")
         return input_file
 
-def create_video(background, audio, output_file=None, title="Reddit Story", story_text=""):
-    """ Combines resized video with AI-generated voiceover and adds animated subtitles """
+def create_video(background, audio, output_file=None, title="Reddit Story", story_text="", engine="moviepy", resize=True,
+                 loop_crossfade=0.0, profiles=None, timing_map=None, work_dir=None, height=720, fps=24,
+                 on_segment=None):
+    """
+    Combines resized video with AI-generated voiceover and adds animated subtitles.
+    engine="ffmpeg" renders everything in a single FFmpeg pass instead of compositing frames in moviepy,
+    engine="parallel" renders GOP-aligned segments on every core and stream-copies them together.
+    engine="incremental" keeps the segments in work_dir and re-encodes only the ones whose captions changed since
+    last time,
+    engine="hls" streams fMP4 HLS segments and a live playlist out while encoding (see render_hls.py) and returns
+    the playlist; on_segment(path) is called for each segment as soon as it is ready,
+    engine="draft" renders a quick low-resolution preview without fades (see preview.py).
+    profiles (e.g. ["shorts", "landscape", "square"]) renders every format from one decode with FFmpeg and
+    returns {name: path}; see render_profiles.OUTPUT_PROFILES.
+    Pass resize=False when the background has already been through resize_video.
+    timing_map (from audio_analysis.analyze_voiceover) places captions on the measured speech for every engine.
+    height and fps set the output frame (the draft engine keeps its own smaller ones).
+    loop_crossfade dissolves the end of the background into its start (seconds) so the loop seam is invisible.
+    """
+    if profiles:
+        from render_profiles import create_video_profiles
+        return create_video_profiles(background, audio, profiles, output_file, title=title, story_text=story_text,
+                                     fps=fps, timing_map=timing_map)
+
+    if engine == "ffmpeg":
+        from render_ffmpeg import create_video_ffmpeg
+        return create_video_ffmpeg(background, audio, output_file, title=title, story_text=story_text,
+                                   height=height, fps=fps, timing_map=timing_map)
+
+    if engine == "parallel":
+        from render_parallel import create_video_parallel
+        return create_video_parallel(background, audio, output_file, title=title, story_text=story_text,
+                                     height=height, fps=fps, timing_map=timing_map)
+
+    if engine == "incremental":
+        from render_incremental import create_video_incremental
+        return create_video_incremental(background, audio, output_file, title=title, story_text=story_text,
+                                        height=height, fps=fps, timing_map=timing_map, work_dir=work_dir)
+
+    if engine == "hls":
+        from render_hls import create_video_hls
+        output_dir = os.path.splitext(output_file)[0] + "_hls" if output_file else None
+        return create_video_hls(background, audio, output_dir, title=title, story_text=story_text,
+                                height=height, fps=fps, timing_map=timing_map, on_segment=on_segment)
+
+    if engine == "draft":
+        from preview import create_preview
+        return create_preview(background, audio, output_file, title=title, story_text=story_text,
+                              timing_map=timing_map)
+
     ensure_dir(RESULTS_DIR)
 
     if output_file is None:
@@ -81,29 +173,32 @@ def create_video(background, audio, output_file=None, title="Reddit Story", stor
         print("⚠ No captions provided!")
 
     # Resize video first
-    background_resized = resize_video(background)
+    background_resized = resize_video(background, height=height) if resize else background
 
     try:
-        video_clip = VideoFileClip(background_resized)
         audio_clip = AudioFileClip(audio)
 
+        if audio_clip.duration == 0:
+            raise ValueError("❌ Error: Invalid video or audio file.")
+
+        # ffmpeg loops and trims the background while decoding (-stream_loop), so moviepy sees one continuous
+        # stream of exactly the voiceover's length instead of re-opening and re-decoding the clip every loop
+        video_clip, background_reader = looped_background_clip(background_resized, audio_clip.duration, fps=fps,
+                                                               crossfade=loop_crossfade)
+
         if video_clip.w == 0 or video_clip.h == 0:
             raise ValueError("❌ Error: Video width or height is 0.")
 
-        if video_clip.duration == 0 or audio_clip.duration == 0:
+        if background_reader.source_duration == 0:
             raise ValueError("❌ Error: Invalid video or audio file.")
 
-        # Ensure video matches audio duration
-        if video_clip.duration < audio_clip.duration:
+        if background_reader.source_duration < audio_clip.duration:
             print("🔄 Looping video to match voiceover duration...")
-            video_clip = video_clip.loop(duration=audio_clip.duration)
-        else:
-            video_clip = video_clip.subclip(0, audio_clip.duration)
 
         video_clip = video_clip.set_audio(audio_clip)
 
         # Generate animated title
-        title_clip = TextClip(
+        title_sprite = get_sprite(
             title,
             fontsize=70,
             color="white",
@@ -112,16 +207,14 @@ def create_video(background, audio, output_file=None, title="Reddit Story", stor
             stroke_width=4,
             method="label",
             size=(video_clip.w - 200, None)
-        ).set_position(("center", 50)).set_duration(3)
-
-        title_clip = fadein(title_clip, 1).set_duration(4)
+        )
+        overlays = [Overlay(title_sprite, (video_clip.w - title_sprite.shape[1]) // 2, 50, 0, 4, fade_in=1)]
 
         # Generate animated subtitles
-        subtitles = split_text_with_voice_timing(story_text, audio_clip.duration)
-        subtitle_clips = [title_clip]
+        subtitles = split_text_with_voice_timing(story_text, audio_clip.duration, timing_map=timing_map)
 
         for start_time, text, duration in subtitles:
-            subtitle_text = TextClip(
+            subtitle_sprite = get_sprite(
                 text,
                 fontsize=50,
                 color='yellow',
@@ -130,23 +223,25 @@ def create_video(background, audio, output_file=None, title="Reddit Story", stor
                 stroke_width=3,
                 method="caption",
                 size=(video_clip.w - 200, None)
-            ).set_position(("center", video_clip.h - 200)).set_start(start_time).set_duration(duration)
-
-            subtitle_text = fadein(subtitle_text, 0.5)  # Smooth fade-in effect
-            subtitle_text = fadeout(subtitle_text, 0.5)  # Smooth fade-out effect
-
-            subtitle_clips.append(subtitle_text)
+            )
+            overlays.append(Overlay(subtitle_sprite, (video_clip.w - subtitle_sprite.shape[1]) // 2,
+                                    video_clip.h - 200, start_time, start_time + duration,
+                                    fade_in=0.5, fade_out=0.5))  # Smooth fade-in/fade-out effect
 
-        final_video = CompositeVideoClip([video_clip] + subtitle_clips)
+        # Only the one or two captions active in each frame are blended, over their bounding boxes
+        final_video = SubtitleCompositor(overlays, video_clip.w, video_clip.h).apply(video_clip)
 
-        with tqdm(total=int(audio_clip.duration), desc="Rendering Video", unit="s") as pbar:
+        total_frames = math.ceil(audio_clip.duration * fps)
+        with tqdm(total=total_frames, desc="Rendering Video", unit="frame") as pbar:
             def update_progress(current_frame):
-                pbar.update(current_frame / final_video.fps - pbar.n)
+                pbar.update(min(current_frame, total_frames) - pbar.n)
 
-            final_video.write_videofile(output_file, fps=24, codec="libx264", threads=4, preset="ultrafast")
+            with tracing.span("encode", engine="moviepy", frames=total_frames):
+                final_video.write_videofile(output_file, fps=fps, codec="libx264", threads=4, preset="ultrafast",
+                                            logger=FrameProgressLogger(update_progress))
 
-        video_clip.reader.close()
-        video_clip.audio.reader.close()
+        background_reader.close()
+        audio_clip.close()
 
         print("✅ Video Created Successfully:", output_file)
 
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+import tracing
+
+CHUNK_SIZE = 1024 * 1024  # 1 MB
+POOL_SIZE = 16
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """ Shared requests.Session so every API call and download reuses pooled keep-alive connections """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+def file_sha256(path, chunk_size=CHUNK_SIZE):
+    """ SHA-256 of a file, read in chunks """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class RetryableStatus(requests.HTTPError):
+    """ A response worth retrying (429 or 5xx), with the server's Retry-After hint if it sent one """
+
+    def __init__(self, response):
+        super().__init__(f"{response.status_code} {response.reason}", response=response)
+        retry_after = response.headers.get("Retry-After", "")
+        self.retry_after = int(retry_after) if retry_after.isdigit() else None
+
+def read_part_info(info_path):
+    """ What the .part file was downloaded from ({"url", "etag", "last_modified"}), or None """
+    try:
+        with open(info_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_part_info(info_path, url, response):
+    with open(info_path, "w", encoding="utf-8") as f:
+        json.dump({"url": url, "etag": response.headers.get("ETag"),
+                   "last_modified": response.headers.get("Last-Modified")}, f)
+
+@tracing.traced("download")
+def download_file(url, output_path, expected_size=None, headers=None, retries=5, chunk_size=CHUNK_SIZE, timeout=30):
+    """
+    Stream url to output_path without holding it in memory.
+    Data goes to output_path + ".part" and is renamed into place only after its size matches expected_size
+    (or the server's Content-Length). Dropped connections, timeouts, 429 and 5xx responses are retried with
+    backoff. A .part file is only resumed (HTTP Range + If-Range) if it came from the same URL and the server
+    still has the same version of the file; otherwise the download starts over.
+    """
+    part_path = output_path + ".part"
+    info_path = part_path + ".json"
+    session = get_session()
+    total_size = expected_size
+
+    for attempt in range(retries + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        info = read_part_info(info_path) if offset else None
+        validator = info and (info.get("etag") or info.get("last_modified"))
+        if offset and (info is None or info.get("url") != url or not validator):
+            offset = 0  # Can't tell what the part file holds, so don't append to it
+
+        request_headers = dict(headers or {})
+        if offset:
+            request_headers["Range"] = f"bytes={offset}-"
+            request_headers["If-Range"] = validator  # A changed file comes back whole (200) instead of a range
+
+        try:
+            with session.get(url, headers=request_headers, stream=True, timeout=timeout) as response:
+                if response.status_code == 416 and offset:
+                    # The part file already holds the whole body
+                    break
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise RetryableStatus(response)
+                response.raise_for_status()
+
+                if offset and response.status_code != 206:
+                    offset = 0  # Server ignored the Range header or the file changed, start over
+
+                if response.status_code == 206:
+                    content_range = response.headers.get("Content-Range", "")
+                    if "/" in content_range and content_range.rsplit("/", 1)[1].isdigit():
+                        total_size = total_size or int(content_range.rsplit("/", 1)[1])
+                elif "Content-Length" in response.headers:
+                    total_size = total_size or int(response.headers["Content-Length"])
+
+                if not offset:
+                    write_part_info(info_path, url, response)
+                with open(part_path, "ab" if offset else "wb") as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        if chunk:
+                            f.write(chunk)
+            break
+
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+                RetryableStatus) as e:
+            if attempt == retries:
+                raise
+            wait = min(2 ** attempt, 30)
+            if isinstance(e, RetryableStatus) and e.retry_after is not None:
+                wait = min(e.retry_after, 120)
+            print(f"⚠ Download interrupted ({e}), retrying in {wait}s...")
+            time.sleep(wait)
+
+    size = os.path.getsize(part_path)
+    if total_size is not None and size != total_size:
+        for path in (part_path, info_path):
+            if os.path.exists(path):
+                os.remove(path)
+        raise IOError(f"Downloaded size {size} does not match expected {total_size}")
+
+    os.replace(part_path, output_path)
+    if os.path.exists(info_path):
+        os.remove(info_path)
+    return output_path
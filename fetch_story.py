@@ -1,20 +1,61 @@
 import praw
 from secrets_ import REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, REDDIT_USER_AGENT
 
-def get_top_story(subreddit="AmItheAsshole"):
+_reddit = None
+
+def get_reddit():
     """
-    Fetch the top Reddit story from the given subreddit.
+    Shared Reddit client, created on first use and reused for every call in this process.
+    """
+    global _reddit
+    if _reddit is None:
+        _reddit = praw.Reddit(client_id=REDDIT_CLIENT_ID,
+                              client_secret=REDDIT_CLIENT_SECRET,
+                              user_agent=REDDIT_USER_AGENT)
+    return _reddit
+
+def get_top_post(subreddit="AmItheAsshole"):
+    """
+    Fetch the top Reddit story from the given subreddit as (post id, text); the id is None if the fetch failed.
     """
-    reddit = praw.Reddit(client_id=REDDIT_CLIENT_ID,
-                         client_secret=REDDIT_CLIENT_SECRET,
-                         user_agent=REDDIT_USER_AGENT)
+    reddit = get_reddit()
     try:
         subreddit = reddit.subreddit(subreddit)
         top_post = next(subreddit.top(limit=1))  # Get top story
-        return top_post.title + "\n" + top_post.selftext
+        return top_post.id, top_post.title + "\n" + top_post.selftext
     except Exception as e:
         print(f"⚠ Error fetching story: {e}")
-        return "No story available at the moment."
+        return None, "No story available at the moment."
+
+def get_top_story(subreddit="AmItheAsshole"):
+    """
+    Fetch the top Reddit story from the given subreddit.
+    """
+    return get_top_post(subreddit)[1]
+
+def get_top_stories(subreddits=("AmItheAsshole",), limit=10, time_filter="day"):
+    """
+    Fetch up to `limit` top text posts across the given subreddits, highest score first.
+    """
+    reddit = get_reddit()
+    stories = []
+    for name in subreddits:
+        try:
+            for post in reddit.subreddit(name).top(time_filter=time_filter, limit=limit):
+                if post.stickied or not post.selftext:
+                    continue
+                stories.append({
+                    "id": post.id,
+                    "subreddit": name,
+                    "title": post.title,
+                    "score": post.score,
+                    "text": post.title + "\n" + post.selftext,
+                })
+        except Exception as e:
+            print(f"⚠ Error fetching stories from r/{name}: {e}")
+
+    stories.sort(key=lambda story: story["score"], reverse=True)
+    return stories[:limit]
 
 
 # import os
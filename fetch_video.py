@@ -1,15 +1,29 @@
 import os
-import requests
+from download import download_file, get_session
 from secrets_ import PEXELS_API_KEY
 
 RESULTS_DIR = "results"
+VIDEO_QUERY = "cinematic background"
 
 def ensure_dir(directory):
     """ Ensure that a directory exists """
     if not os.path.exists(directory):
         os.makedirs(directory)
 
-def get_stock_video(output_path=None):
+def pick_rendition(video_files, target_height=720):
+    """
+    Pick the smallest rendition at or above target_height, or the largest one if none are that tall.
+    """
+    files = [f for f in video_files if f.get("height") and f.get("link")]
+    if not files:
+        return video_files[0] if video_files else None
+
+    tall_enough = [f for f in files if f["height"] >= target_height]
+    if tall_enough:
+        return min(tall_enough, key=lambda f: (f["height"], f.get("width") or 0))
+    return max(files, key=lambda f: f["height"])
+
+def get_stock_video(output_path=None, query=VIDEO_QUERY, target_height=720):
     """
     Fetch a stock video from Pexels API and save it in the results directory.
     """
@@ -19,19 +33,19 @@ def get_stock_video(output_path=None):
         output_path = os.path.join(RESULTS_DIR, "background.mp4")
 
     print("📹 Fetching stock video...")
-    url = f"https://api.pexels.com/videos/search?query=cinematic background&per_page=1"
+    url = f"https://api.pexels.com/videos/search?query={query}&per_page=1"
     headers = {"Authorization": PEXELS_API_KEY}
     
     try:
-        response = requests.get(url, headers=headers).json()
+        response = get_session().get(url, headers=headers, timeout=30).json()
         if "videos" not in response or len(response["videos"]) == 0:
             print("⚠ No videos found, using a default video.")
             return os.path.join(RESULTS_DIR, "default_background.mp4")
         
-        video_url = response["videos"][0]["video_files"][0]["link"]
+        rendition = pick_rendition(response["videos"][0]["video_files"], target_height)
 
-        with open(output_path, "wb") as f:
-            f.write(requests.get(video_url).content)
+        # Streamed to disk in chunks, resumed on failure and renamed into place once complete
+        download_file(rendition["link"], output_path, expected_size=rendition.get("size"))
 
         print(f"✅ Stock video saved as {output_path}")
         return output_path
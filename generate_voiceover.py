@@ -1,13 +1,108 @@
-from gtts import gTTS
+import hashlib
+import json
+import os
+import re
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from media import probe_media
+import tracing
 
-def generate_voiceover(text, output_file="voiceover.mp3"):
+TTS_CACHE_DIR = os.path.join("cache", "tts")
+TTS_WORKERS = 8
+
+def ensure_dir(directory):
+    """ Ensure that a directory exists """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+def gtts_synthesize(text, output_file, lang="en"):
+    """ Synthesize one chunk of text with gTTS """
+    from gtts import gTTS  # Only this engine needs it
+
+    gTTS(text, lang=lang).save(output_file)
+
+# Name -> function(text, output_file, lang). Register a local fake here to run without network access.
+TTS_ENGINES = {
+    "gtts": gtts_synthesize,
+}
+
+def split_sentences(text):
+    """ Split text into sentences, keeping the closing punctuation """
+    sentences = re.split(r"(?<=[.!?])\s+", text.strip())
+    return [s.strip() for s in sentences if s.strip()]
+
+@tracing.traced("tts.sentence")
+def synthesize_sentence(sentence, lang="en", engine="gtts", cache_dir=TTS_CACHE_DIR):
+    """ Return the cached mp3 for one sentence, synthesizing it only if (text, lang, engine) is new """
+    key = hashlib.sha256(json.dumps([sentence, lang, engine]).encode("utf-8")).hexdigest()[:32]
+    path = os.path.join(cache_dir, f"{key}.mp3")
+    if os.path.exists(path):
+        return path
+
+    tmp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.mp3"
+    try:
+        TTS_ENGINES[engine](sentence, tmp_file, lang=lang)
+        if not os.path.exists(tmp_file) or os.path.getsize(tmp_file) == 0:
+            raise RuntimeError(f"TTS engine {engine!r} produced no audio for: {sentence[:80]!r}")
+        os.replace(tmp_file, path)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return path
+
+def concat_audio(chunk_files, output_file):
+    """ Join mp3 chunks without re-encoding; raises RuntimeError (leaving no partial output) if ffmpeg fails """
+    list_file = output_file + ".txt"
+    try:
+        with open(list_file, "w", encoding="utf-8") as f:
+            for path in chunk_files:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+
+        command = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_file, "-c", "copy", output_file]
+        process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if process.returncode != 0 or not os.path.exists(output_file):
+            if os.path.exists(output_file):
+                os.remove(output_file)
+            raise RuntimeError(f"Joining voiceover chunks failed: {process.stderr.decode(errors='ignore')[-1000:]}")
+    finally:
+        if os.path.exists(list_file):
+            os.remove(list_file)
+
+def generate_voiceover(text, output_file="voiceover.mp3", lang="en", engine="gtts", workers=TTS_WORKERS,
+                       cache_dir=TTS_CACHE_DIR, timings_file=None):
     """
     Generate an AI voiceover from text.
+    Sentences are synthesized concurrently and cached individually, so editing one sentence only
+    re-synthesizes that sentence. Returns each sentence's start offset and duration (also written
+    to timings_file as JSON if given). Raises ValueError for empty text and RuntimeError if synthesis or
+    joining fails, so no caller goes on with a missing voiceover.
     """
     print("🔊 Generating voiceover...")
-    tts = gTTS(text, lang="en")
-    tts.save(output_file)
+    ensure_dir(cache_dir)
+
+    sentences = split_sentences(text or "")
+    if not sentences:
+        raise ValueError("No text to synthesize: the formatted story is empty")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        chunk_files = list(pool.map(lambda s: synthesize_sentence(s, lang, engine, cache_dir), sentences))
+
+    concat_audio(chunk_files, output_file)
+
+    timings = []
+    offset = 0.0
+    for sentence, path in zip(sentences, chunk_files):
+        duration = probe_media(path)[2]
+        timings.append({"start": round(offset, 3), "duration": round(duration, 3), "text": sentence})
+        offset += duration
+
+    if timings_file:
+        with open(timings_file, "w", encoding="utf-8") as f:
+            json.dump(timings, f, indent=2)
+
     print(f"✅ Voiceover saved as {output_file}")
+    return timings
 
 # import os
 # from gtts import gTTS
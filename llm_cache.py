@@ -0,0 +1,131 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+LLM_CACHE_DB = os.path.join("cache", "llm_cache.db")
+MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", 256 * 1024 ** 2))  # 256 MB of responses
+TTL_SECONDS = int(os.environ.get("LLM_CACHE_TTL", 90 * 24 * 3600))  # 90 days
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    template TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+def ensure_dir(directory):
+    """ Ensure that a directory exists """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+def sha256(text):
+    """ Hex SHA-256 of a string """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def connect(db_path=LLM_CACHE_DB):
+    """ Open the cache database, creating the schema if needed """
+    ensure_dir(os.path.dirname(db_path) or ".")
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def template_version(template):
+    """ Short hash of a prompt template, so editing the prompt invalidates old responses """
+    return sha256(template)[:12]
+
+def cache_key(provider, model, template, text):
+    """ Key for a response: provider, model, prompt template version and input text hash """
+    return sha256("\0".join([provider, model, template_version(template), sha256(text)]))
+
+def bump(conn, name):
+    """ Increment a hit/miss counter """
+    conn.execute("INSERT INTO counters (name, value) VALUES (?, 1) "
+                 "ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,))
+
+def get(provider, model, template, text, ttl=TTL_SECONDS, db_path=LLM_CACHE_DB):
+    """ Return a cached response, or None on a miss, an expired entry or an empty response """
+    key = cache_key(provider, model, template, text)
+    now = time.time()
+    conn = connect(db_path)
+    try:
+        row = conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None and (now - row[1] > ttl or not row[0].strip()):
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            row = None
+
+        if row is None:
+            bump(conn, "misses")
+            conn.commit()
+            return None
+
+        conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        bump(conn, "hits")
+        conn.commit()
+        return row[0]
+    finally:
+        conn.close()
+
+def put(provider, model, template, text, response, max_bytes=MAX_BYTES, ttl=TTL_SECONDS, db_path=LLM_CACHE_DB):
+    """
+    Store a response and evict expired, then least recently used, entries beyond max_bytes.
+    Empty or whitespace-only responses (a failed or truncated generation) are not stored.
+    """
+    if not response or not response.strip():
+        return
+    now = time.time()
+    conn = connect(db_path)
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, provider, model, template, input_hash, response, size, "
+            "created, last_access) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (cache_key(provider, model, template, text), provider, model, template_version(template),
+             sha256(text), response, len(response.encode("utf-8")), now, now),
+        )
+        evict(conn, max_bytes, ttl, now)
+        conn.commit()
+    finally:
+        conn.close()
+
+def evict(conn, max_bytes=MAX_BYTES, ttl=TTL_SECONDS, now=None):
+    """ Drop expired entries, then the least recently used ones until the cache fits in max_bytes """
+    now = now or time.time()
+    conn.execute("DELETE FROM responses WHERE created < ?", (now - ttl,))
+
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total <= max_bytes:
+        return total
+
+    for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+        if total <= max_bytes:
+            break
+        conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+        bump(conn, "evictions")
+        total -= size
+    return total
+
+def stats(db_path=LLM_CACHE_DB):
+    """ Hit/miss/eviction counters plus current entry count and size """
+    conn = connect(db_path)
+    try:
+        result = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        result.update({"entries": entries, "bytes": size})
+        for name in ("hits", "misses", "evictions"):
+            result.setdefault(name, 0)
+        return result
+    finally:
+        conn.close()
@@ -1,78 +1,320 @@
+import glob
+import json
 import os
-from fetch_story import get_top_story
-from reformat_story import reformat_story_ollama
+import shutil
+import time
+from fetch_story import get_top_post
+from reformat_story import reformat_story_ollama, OLLAMA_MODEL, PROMPT_TEMPLATE, CHUNK_PROMPT_TEMPLATE
 from generate_voiceover import generate_voiceover
-from fetch_video import get_stock_video
-from create_video import create_video
+from audio_analysis import analyze_voiceover, settings as audio_settings
+from fetch_video import get_stock_video, VIDEO_QUERY
+from create_video import create_video, resize_video
+from stage_scheduler import Stage, run_stages
+from video_library import select_clip
+from story_dedup import find_duplicate, remember_story
+import stage_cache
+import tracing
 
 # Define cache paths
 CACHE_DIR = "cache"
 RESULTS_DIR = "results"
 
-STORY_FILE = os.path.join(CACHE_DIR, "story.txt")
-FORMATTED_FILE = os.path.join(CACHE_DIR, "formatted_story.txt")
-VOICEOVER_FILE = os.path.join(RESULTS_DIR, "voiceover.mp3")
-VIDEO_FILE = os.path.join(RESULTS_DIR, "background.mp4")
-FINAL_VIDEO = os.path.join(RESULTS_DIR, "final_video.mp4")
+FINAL_VIDEO_NAME = "final_video.mp4"
+SEGMENTS_DIR_NAME = "segments"  # Encoded segments kept by the incremental engine for the next render of the job
+TRACE_NAME = "trace.json"  # Chrome trace of the run (chrome://tracing or ui.perfetto.dev)
+SUMMARY_NAME = "run_summary.json"
+
+# Stage inputs: changing any of these invalidates the stages that depend on them
+SUBREDDIT = "AmItheAsshole"
+TTS_LANG = "en"
+TTS_ENGINE = "gtts"
+TITLE = "Reddit Story"
+RENDER_HEIGHT = 720
+RENDER_FPS = 24
+WORDS_PER_SECOND = 2.5  # Narration speed used to estimate how long a background clip needs to be
+
+# "moviepy" composites frames in Python, "ffmpeg" renders in a single FFmpeg pass (much faster, same look),
+# "parallel" renders segments across all CPU cores, "incremental" re-encodes only segments whose captions changed
+RENDER_ENGINE = "moviepy"
+
+# What to do with near-duplicates of stories we've already seen: "skip", "flag" (warn and continue) or "off"
+DEDUP_MODE = "skip"
+
+# Compress long TTS pauses and time captions from the measured speech instead of a words-per-second guess
+AUDIO_ANALYSIS = True
+
+# Stream LLM tokens -> sentence TTS -> per-span render instead of running the stages one after another
+STREAMING = False
+
+# Disk budget for the stage cache; least recently used artifacts are evicted beyond this
+CACHE_MAX_BYTES = int(os.environ.get("STAGE_CACHE_MAX_BYTES", stage_cache.DEFAULT_MAX_BYTES))
 
 def ensure_dir(directory):
     """ Ensure that a directory exists """
     if not os.path.exists(directory):
         os.makedirs(directory)
 
-def read_cache(file_path):
-    """ Read a file from cache if it exists """
-    if os.path.exists(file_path):
-        with open(file_path, "r", encoding="utf-8") as f:
-            return f.read()
-    return None
+def fetch_story_stage(subreddit):
+    """
+    Step 1: Fetch story (today's top post; the cached one is only reused on the same day).
+    Returns (story, post id); the id is what the story store indexed the post under.
+    """
+    story_key = stage_cache.stage_key("story_post", subreddit=subreddit, day=time.strftime("%Y-%m-%d"))
+    cached = stage_cache.read_text(story_key)
+    if not cached:
+        print("📜 Fetching new story...")
+        with tracing.span("reddit.fetch", subreddit=subreddit):
+            story_id, story = get_top_post(subreddit)
+        stage_cache.write_text(story_key, json.dumps({"id": story_id, "text": story}), max_bytes=CACHE_MAX_BYTES)
+    else:
+        print("🔄 Using cached story...")
+        post = json.loads(cached)
+        story_id, story = post["id"], post["text"]
+    return story, story_id
+
+def is_duplicate(story, story_id=None):
+    """
+    Check the near-duplicate index before spending LLM, TTS and render time on a story. This only reads the
+    index; the story is added by remember_used once its video exists. Pass the Reddit post id when there is
+    one: the story store indexes every ingested post under it, and a story must not match its own copy.
+    """
+    if DEDUP_MODE == "off":
+        return False
+
+    match = find_duplicate(story, story_id)
+    if not match:
+        return False
+
+    duplicate_id, score = match
+    print(f"⚠ Story looks like a repost of {duplicate_id} ({score:.0%} similar)")
+    return DEDUP_MODE == "skip"
+
+def remember_used(story, story_id=None):
+    """ Add a story whose video was made to the near-duplicate index, so later reposts of it are caught """
+    if DEDUP_MODE != "off":
+        remember_story(story, story_id)
+
+def format_story_stage(story):
+    """ Step 2: Format story """
+    formatted_key = stage_cache.stage_key("formatted", story=story, model=OLLAMA_MODEL, prompt=PROMPT_TEMPLATE,
+                                          chunk_prompt=CHUNK_PROMPT_TEMPLATE)
+    formatted_story = stage_cache.read_text(formatted_key)
+    if not formatted_story:
+        print("✍ Formatting story...")
+        formatted_story = reformat_story_ollama(story, model=OLLAMA_MODEL, prompt_template=PROMPT_TEMPLATE)
+        stage_cache.write_text(formatted_key, formatted_story, max_bytes=CACHE_MAX_BYTES)
+    else:
+        print("🔄 Using cached formatted story...")
+    return formatted_story
+
+def voiceover_stage(formatted_story):
+    """ Step 3: Generate voiceover """
+    voiceover_key = stage_cache.stage_key("voiceover", text=formatted_story, lang=TTS_LANG, engine=TTS_ENGINE)
+    voiceover_file = stage_cache.lookup(voiceover_key)
+    if not voiceover_file:
+        print("🔊 Generating new voiceover...")
+        tmp_file = stage_cache.temp_path(voiceover_key, ".mp3")
+        generate_voiceover(formatted_story, tmp_file, lang=TTS_LANG, engine=TTS_ENGINE)
+        voiceover_file = stage_cache.commit(voiceover_key, tmp_file, max_bytes=CACHE_MAX_BYTES)
+    else:
+        print("🔊 Using cached voiceover...")
+    return voiceover_file
+
+def audio_stage(raw_voiceover_file):
+    """ Step 3b: Trim long pauses from the voiceover and measure where each phrase is spoken """
+    audio_key = stage_cache.stage_key("audio", voiceover=raw_voiceover_file, settings=audio_settings())
+    timing_key = stage_cache.stage_key("audio_timing", voiceover=raw_voiceover_file, settings=audio_settings())
+    voiceover_file = stage_cache.lookup(audio_key)
+    timing_text = stage_cache.read_text(timing_key)
+    if voiceover_file and timing_text:
+        print("📈 Using cached voiceover analysis...")
+        return voiceover_file, json.loads(timing_text)
+
+    tmp_file = stage_cache.temp_path(audio_key, ".wav")
+    timing_map = analyze_voiceover(raw_voiceover_file, tmp_file)
+    voiceover_file = stage_cache.commit(audio_key, tmp_file, max_bytes=CACHE_MAX_BYTES)
+    stage_cache.write_text(timing_key, json.dumps(timing_map), max_bytes=CACHE_MAX_BYTES)
+    return voiceover_file, timing_map
+
+def background_stage(story):
+    """
+    Step 4: Pick a clip from the local library, or fetch a stock video. The length is estimated from the
+    original story so this doesn't wait for the rewrite; the clip loops if the narration runs longer.
+    Returns (path, sha256); the hash is only known for library clips and keys their normalized copy.
+    """
+    min_duration = len(story.split()) / WORDS_PER_SECOND
+    video_path, video_hash = select_clip(min_duration, RENDER_HEIGHT, VIDEO_QUERY)
+    if video_path:
+        print("📹 Using library background...")
+        return video_path, video_hash
+
+    background_key = stage_cache.stage_key("background", query=VIDEO_QUERY)
+    # Batch jobs starting together all miss the cache; only the first downloads, the others wait for it
+    with stage_cache.KeyLock(background_key):
+        video_path = stage_cache.lookup(background_key)
+        if not video_path:
+            print("🎥 Fetching new stock video...")
+            # A stable path, so a download cut short by a crash is resumed by the next run
+            tmp_file = stage_cache.download_path(background_key, ".mp4")
+            video_path = get_stock_video(tmp_file, query=VIDEO_QUERY, target_height=RENDER_HEIGHT)
+            if video_path == tmp_file and os.path.getsize(tmp_file) >= 1000:
+                video_path = stage_cache.commit(background_key, tmp_file, max_bytes=CACHE_MAX_BYTES)
+        else:
+            print("📹 Using cached stock video...")
+    return video_path, None
+
+def resize_stage(background_file, background_hash=None):
+    """ Step 4b: Normalize the background for the moviepy engine as soon as it is downloaded """
+    return resize_video(background_file, height=RENDER_HEIGHT, source_hash=background_hash)
+
+def render_stage(video_path, voiceover_file, formatted_story, title, engine, resized, timing_map=None,
+                 work_dir=None):
+    """ Step 5: Create final video """
+    render_key = stage_cache.stage_key("render", voiceover=voiceover_file, background=video_path,
+                                       title=title, text=formatted_story, engine=engine,
+                                       height=RENDER_HEIGHT, fps=RENDER_FPS)
+    rendered_file = stage_cache.lookup(render_key)
+    if not rendered_file:
+        print("🎬 Creating final video...")
+        tmp_file = stage_cache.temp_path(render_key, ".mp4")
+        try:
+            create_video(video_path, voiceover_file, tmp_file, title=title, story_text=formatted_story,
+                         engine=engine, resize=not resized, timing_map=timing_map, work_dir=work_dir,
+                         height=RENDER_HEIGHT, fps=RENDER_FPS)
+            if os.path.exists(tmp_file) and os.path.getsize(tmp_file) > 1000:
+                rendered_file = stage_cache.commit(render_key, tmp_file, max_bytes=CACHE_MAX_BYTES)
+        finally:
+            # A failed or partial render (and the engines' side files, e.g. subtitles) must not pile up in the cache
+            for path in glob.glob(glob.escape(os.path.splitext(tmp_file)[0]) + "*"):
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.remove(path)
+    else:
+        print("🎬 Using cached final video...")
+    return rendered_file
+
+def pipeline_stages(title=TITLE, engine=RENDER_ENGINE, job_dir=RESULTS_DIR):
+    """
+    The pipeline as a dependency graph, starting from the story. The background is sized from the original
+    story, so picking or downloading it (and the resize) overlaps with the rewrite and TTS; the critical path
+    is rewrite -> TTS -> render.
+    """
+    if engine == "hls":
+        # The render cache, its cleanup and the final copy all handle one video file, not a playlist directory
+        raise ValueError("The hls engine writes a playlist and segments, not a single video, so the pipeline "
+                         "can't use it; call create_video(..., engine=\"hls\", on_segment=...) directly")
 
-def write_cache(file_path, data):
-    """ Write data to a cache file, ensuring directory exists """
+    stages = [Stage("format", format_story_stage, inputs=["story"], outputs=["formatted_story"])]
+
+    if AUDIO_ANALYSIS:
+        stages += [
+            Stage("voiceover", voiceover_stage, inputs=["formatted_story"], outputs=["raw_voiceover_file"]),
+            Stage("audio", audio_stage, inputs=["raw_voiceover_file"], outputs=["voiceover_file", "timing_map"],
+                  kind="cpu"),
+        ]
+    else:
+        stages.append(Stage("voiceover", voiceover_stage, inputs=["formatted_story"], outputs=["voiceover_file"]))
+
+    # Only the moviepy engine needs a pre-resized background; the FFmpeg engines scale while rendering
+    if engine == "moviepy":
+        stages += [
+            Stage("background", background_stage, inputs=["story"], outputs=["background_file", "background_hash"]),
+            Stage("resize", resize_stage, inputs=["background_file", "background_hash"], outputs=["video_path"],
+                  kind="cpu"),
+        ]
+    else:
+        stages.append(Stage("background", background_stage, inputs=["story"],
+                            outputs=["video_path", "background_hash"]))
+
+    render_inputs = ["video_path", "voiceover_file", "formatted_story"] + (["timing_map"] if AUDIO_ANALYSIS else [])
+    stages.append(Stage("render", render_stage, inputs=render_inputs,
+                        outputs=["rendered_file"], kind="cpu",
+                        params={"title": title, "engine": engine, "resized": engine == "moviepy",
+                                "work_dir": os.path.join(job_dir, SEGMENTS_DIR_NAME)}))
+    return stages
+
+def write_run_trace(job_dir):
+    """ Save the run's Chrome trace and summary next to its outputs and print the summary """
+    run_summary = tracing.summary()
+    tracing.write_trace(os.path.join(job_dir, TRACE_NAME))
+    tracing.write_summary(os.path.join(job_dir, SUMMARY_NAME), run_summary)
+    tracing.print_summary(run_summary)
+
+def run_pipeline(story=None, subreddit=SUBREDDIT, title=TITLE, job_dir=RESULTS_DIR, engine=RENDER_ENGINE,
+                 story_id=None, check_duplicates=True):
+    """
+    Run every stage for one story and return the path of the final video, or None if rendering failed
+    or the story was skipped as a near-duplicate.
+    Pass `story` to skip the Reddit fetch; all outputs for this run are written inside job_dir.
+    """
     ensure_dir(CACHE_DIR)
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(data)
-
-# Ensure directories exist
-ensure_dir(CACHE_DIR)
-ensure_dir(RESULTS_DIR)
-
-# Step 1: Fetch story
-story = read_cache(STORY_FILE)
-if not story:
-    print("📜 Fetching new story...")
-    story = get_top_story()
-    write_cache(STORY_FILE, story)
-else:
-    print("🔄 Using cached story...")
-
-# Step 2: Format story
-formatted_story = read_cache(FORMATTED_FILE)
-if not formatted_story:
-    print("✍ Formatting story...")
-    formatted_story = reformat_story_ollama(story)
-    write_cache(FORMATTED_FILE, formatted_story)
-else:
-    print("🔄 Using cached formatted story...")
-
-# Step 3: Generate voiceover
-if not os.path.exists(VOICEOVER_FILE):
-    print("🔊 Generating new voiceover...")
-    generate_voiceover(formatted_story, VOICEOVER_FILE)
-else:
-    print("🔊 Using cached voiceover...")
-
-# Step 4: Fetch stock video
-if not os.path.exists(VIDEO_FILE) or os.path.getsize(VIDEO_FILE) < 1000:
-    print("🎥 Fetching new stock video...")
-    video_path = get_stock_video()
-    os.rename(video_path, VIDEO_FILE)
-else:
-    print("📹 Using cached stock video...")
-    video_path = VIDEO_FILE
-
-# Step 5: Create final video
-print("🎬 Creating final video...")
-create_video(video_path, VOICEOVER_FILE, FINAL_VIDEO, title="Reddit Story", story_text=formatted_story)
-
-print("✅ Video creation complete:", FINAL_VIDEO)
+    ensure_dir(job_dir)
+    final_video = os.path.join(job_dir, FINAL_VIDEO_NAME)
+    tracing.reset()
+
+    if story is None:
+        story, story_id = fetch_story_stage(subreddit)
+
+    if check_duplicates and is_duplicate(story, story_id):
+        print("⏭ Skipping duplicate story.")
+        return None
+
+    try:
+        values = run_stages(pipeline_stages(title, engine, job_dir), {"story": story})
+    finally:
+        write_run_trace(job_dir)
+    rendered_file = values.get("rendered_file")
+
+    if not rendered_file:
+        print("❌ Video creation failed.")
+        return None
+
+    shutil.copyfile(rendered_file, final_video)
+    if check_duplicates:
+        remember_used(story, story_id)
+    print("✅ Video creation complete:", final_video)
+    return final_video
+
+def run_streaming_pipeline(story=None, subreddit=SUBREDDIT, title=TITLE, job_dir=RESULTS_DIR, story_id=None):
+    """
+    Streaming variant of run_pipeline: TTS and rendering start while the LLM is still generating,
+    so time to a finished video approaches the LLM generation time for long stories.
+    """
+    from streaming_pipeline import create_video_streaming
+
+    ensure_dir(CACHE_DIR)
+    ensure_dir(job_dir)
+    final_video = os.path.join(job_dir, FINAL_VIDEO_NAME)
+    tracing.reset()
+
+    if story is None:
+        story, story_id = fetch_story_stage(subreddit)
+
+    if is_duplicate(story, story_id):
+        print("⏭ Skipping duplicate story.")
+        return None
+
+    # The background is picked before the rewrite exists, so size it from the original story
+    video_path, _ = background_stage(story)
+
+    try:
+        with tracing.span("stage.streaming"):
+            rendered_file, _ = create_video_streaming(story, video_path, final_video, title=title,
+                                                      model=OLLAMA_MODEL, lang=TTS_LANG, engine=TTS_ENGINE,
+                                                      height=RENDER_HEIGHT)
+    finally:
+        write_run_trace(job_dir)
+    if not rendered_file:
+        print("❌ Video creation failed.")
+        return None
+
+    remember_used(story, story_id)
+    print("✅ Video creation complete:", final_video)
+    return final_video
+
+if __name__ == "__main__":
+    if STREAMING:
+        run_streaming_pipeline()
+    else:
+        run_pipeline()
@@ -0,0 +1,27 @@
+import json
+import subprocess
+
+def probe_media(path):
+    """ Return (width, height, duration) of a media file using ffprobe """
+    command = [
+        "ffprobe", "-v", "error",
+        "-show_entries", "stream=codec_type,width,height:format=duration",
+        "-of", "json", path
+    ]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    info = json.loads(result.stdout or "{}")
+
+    width, height = 0, 0
+    for stream in info.get("streams", []):
+        if stream.get("codec_type") == "video":
+            width, height = int(stream.get("width", 0)), int(stream.get("height", 0))
+            break
+
+    duration = float(info.get("format", {}).get("duration", 0) or 0)
+    return width, height, duration
+
+def scaled_width(width, height, target_height):
+    """ Width after scaling to target_height, rounded down to an even number like scale=trunc(iw/2)*2 """
+    if height == 0:
+        return 0
+    return int(width * target_height / height) // 2 * 2
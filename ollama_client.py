@@ -0,0 +1,50 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from download import get_session
+import tracing
+
+# Any Ollama-compatible server; point OLLAMA_HOST at a local stub to run without a model
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")  # Keep the model loaded between stories
+CONCURRENCY = int(os.environ.get("OLLAMA_CONCURRENCY", "2"))
+
+_slots = threading.BoundedSemaphore(CONCURRENCY)
+
+@tracing.traced("ollama.generate")
+def generate(prompt, model="mistral", on_token=None, host=OLLAMA_HOST, keep_alive=KEEP_ALIVE, options=None,
+             timeout=600):
+    """
+    Run one completion against /api/generate over the shared keep-alive session.
+    Tokens are streamed; on_token(text) is called for each one as it arrives. Returns the full response.
+    At most CONCURRENCY requests are in flight per process.
+    """
+    payload = {"model": model, "prompt": prompt, "stream": True, "keep_alive": keep_alive}
+    if options:
+        payload["options"] = options
+
+    parts = []
+    with _slots:
+        with get_session().post(f"{host}/api/generate", json=payload, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+                token = chunk.get("response", "")
+                if token:
+                    parts.append(token)
+                    if on_token:
+                        on_token(token)
+                if chunk.get("done"):
+                    break
+
+    return "".join(parts)
+
+def generate_many(prompts, model="mistral", concurrency=CONCURRENCY, **kwargs):
+    """ Run several prompts concurrently, returning responses in the same order """
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        return list(pool.map(lambda prompt: generate(prompt, model, **kwargs), prompts))
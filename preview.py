@@ -0,0 +1,111 @@
+import argparse
+import math
+import os
+import subprocess
+from media import probe_media, scaled_width
+from render_ffmpeg import build_ass_subtitles, escape_filter_path
+import tracing
+
+RESULTS_DIR = os.path.join("results", "preview")
+
+DRAFT_HEIGHT = 360
+DRAFT_FPS = 12
+DRAFT_CRF = 35
+FINAL_HEIGHT = 720  # Subtitles are laid out for the final frame and scaled down, so placement matches
+
+def ensure_dir(directory):
+    """ Ensure that a directory exists """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+def create_preview(background, audio, output_file=None, title="Reddit Story", story_text="", start=0.0,
+                   duration=None, height=DRAFT_HEIGHT, fps=DRAFT_FPS, final_height=FINAL_HEIGHT,
+                   timing_map=None):
+    """
+    Fast draft render for reviewing caption timing and title placement: low resolution and frame rate,
+    no fades, ultrafast encoding, and optionally only the window [start, start + duration).
+    Subtitle timings come from split_text_with_voice_timing over the whole voiceover, exactly as in the final
+    render, so a window shows the captions the final video will have at those times.
+    """
+    from create_video import split_text_with_voice_timing
+
+    ensure_dir(RESULTS_DIR)
+
+    if output_file is None:
+        output_file = os.path.join(RESULTS_DIR, "preview.mp4")
+
+    src_width, src_height, background_duration = probe_media(background)
+    _, _, audio_duration = probe_media(audio)
+
+    if src_width == 0 or src_height == 0:
+        print("❌ Error: Video width or height is 0.")
+        return None
+
+    if audio_duration == 0:
+        print("❌ Error: Invalid audio file.")
+        return None
+
+    start = min(max(start, 0.0), audio_duration)
+    end = audio_duration if duration is None else min(start + duration, audio_duration)
+    if end <= start:
+        print("❌ Error: Preview window is empty.")
+        return None
+
+    print(f"👀 Rendering draft preview {start:.1f}s-{end:.1f}s at {height}p/{fps}fps...")
+
+    phrases = split_text_with_voice_timing(story_text, audio_duration, timing_map=timing_map)
+    subtitle_file = os.path.splitext(output_file)[0] + ".ass"
+    build_ass_subtitles(title, phrases, scaled_width(src_width, src_height, final_height), final_height,
+                        subtitle_file, fades=False)
+
+    width = scaled_width(src_width, src_height, height)
+    offset = start % background_duration if background_duration > 0 else 0
+
+    # Shift frame timestamps onto the full timeline so the subtitles keep their final-render times
+    video_filter = (f"scale={width}:{height},fps={fps},"
+                    f"setpts=PTS+{start:.6f}/TB,"
+                    f"subtitles=filename='{escape_filter_path(subtitle_file)}',"
+                    f"setpts=PTS-STARTPTS")
+
+    command = [
+        "ffmpeg", "-y",
+        "-ss", f"{offset:.6f}", "-stream_loop", "-1", "-i", background,
+        "-ss", f"{start:.6f}", "-i", audio,
+        "-filter_complex", f"[0:v]{video_filter}[v]",
+        "-map", "[v]", "-map", "1:a",
+        "-t", f"{end - start:.3f}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-tune", "fastdecode,zerolatency", "-crf", str(DRAFT_CRF),
+        "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "64k", "-ac", "1",
+        "-movflags", "+faststart",
+        output_file
+    ]
+
+    with tracing.span("encode", engine="draft", frames=math.ceil((end - start) * fps)):
+        process = tracing.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    if process.returncode == 0 and os.path.exists(output_file) and os.path.getsize(output_file) > 1000:
+        print("✅ Preview Created:", output_file)
+        return output_file
+
+    print(f"❌ Error creating preview: {process.stderr.decode(errors='ignore')[-2000:]}")
+    return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a fast low-resolution draft of a video for review")
+    parser.add_argument("background")
+    parser.add_argument("audio")
+    parser.add_argument("story", help="Text file with the formatted story used for the captions")
+    parser.add_argument("--title", default="Reddit Story")
+    parser.add_argument("--start", type=float, default=0.0, help="Window start in seconds")
+    parser.add_argument("--seconds", type=float, default=None, help="Only render this many seconds")
+    parser.add_argument("--height", type=int, default=DRAFT_HEIGHT)
+    parser.add_argument("--fps", type=int, default=DRAFT_FPS)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    with open(args.story, "r", encoding="utf-8") as f:
+        story_text = f.read()
+
+    create_preview(args.background, args.audio, args.output, title=args.title, story_text=story_text,
+                   start=args.start, duration=args.seconds, height=args.height, fps=args.fps)
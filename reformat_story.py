@@ -1,23 +1,133 @@
-import subprocess
+import re
+from concurrent.futures import ThreadPoolExecutor
+from ollama_client import CONCURRENCY, generate
+import llm_cache
 
-def reformat_story_ollama(story_text):
+OLLAMA_MODEL = "mistral"
+PROMPT_TEMPLATE = "Rewrite this Reddit story to make it engaging, suspenseful, and suitable for narration:\n\n{story}"
+CHUNK_PROMPT_TEMPLATE = (
+    "You are rewriting part {part} of {parts} of a Reddit story so it is engaging, suspenseful, and suitable "
+    "for narration. Only rewrite this part and continue naturally from what came before; do not add an "
+    "introduction or a conclusion unless this is the first or last part.\n\n"
+    "Title: {title}\n\nWhat happened just before (context only, do not rewrite):\n{context}\n\n"
+    "Part to rewrite:\n\n{story}"
+)
+
+MAX_SINGLE_PROMPT_WORDS = 500  # Longer stories are rewritten in chunks instead of being truncated
+CHUNK_WORDS = 350
+CONTEXT_WORDS = 60
+
+def rewrite(prompt_template, fields, model, on_token=None):
+    """ Run one cached Ollama completion for prompt_template filled with fields """
+    prompt = prompt_template.format(**fields)
+
+    cached = llm_cache.get("ollama", model, prompt_template, prompt)
+    if cached is not None:
+        if on_token:
+            on_token(cached)
+        return cached
+
+    response = generate(prompt, model, on_token=on_token).strip()
+    llm_cache.put("ollama", model, prompt_template, prompt, response)
+    return response
+
+def split_paragraph_chunks(story_text, max_words=CHUNK_WORDS):
+    """
+    Group paragraphs into chunks of at most max_words words, splitting oversized paragraphs on sentences.
+    """
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n|\n", story_text):
+        words = paragraph.split()
+        if not words:
+            continue
+        if len(words) <= max_words:
+            pieces.append(" ".join(words))
+        else:
+            pieces.extend(s for s in re.split(r"(?<=[.!?])\s+", " ".join(words)) if s)
+
+    chunks, current, count = [], [], 0
+    for piece in pieces:
+        size = len(piece.split())
+        if current and count + size > max_words:
+            chunks.append("\n\n".join(current))
+            current, count = [], 0
+        current.append(piece)
+        count += size
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+def reformat_story_chunked(story_text, model=OLLAMA_MODEL, max_words=CHUNK_WORDS, concurrency=CONCURRENCY,
+                           on_token=None):
+    """
+    Map-reduce rewrite for long stories: split on paragraph boundaries, rewrite the chunks concurrently
+    (each carrying the tail of the previous chunk as context) and stitch the results back in order.
+    on_token receives the first chunk token by token as it streams in, then each later chunk once it is
+    finished, in story order, so a listener can start on the opening before the rest is done.
+    """
+    title = story_text.strip().split("\n", 1)[0]
+    chunks = split_paragraph_chunks(story_text, max_words)
+    print(f"✍ Rewriting story in {len(chunks)} chunks...")
+
+    jobs = []
+    for index, chunk in enumerate(chunks):
+        previous = chunks[index - 1].split()[-CONTEXT_WORDS:] if index else []
+        jobs.append({
+            "part": index + 1,
+            "parts": len(chunks),
+            "title": title,
+            "context": " ".join(previous) or "(this is the beginning of the story)",
+            "story": chunk,
+        })
+
+    streamed = []
+
+    def stream_first(token):
+        streamed.append(token)
+        on_token(token)
+
+    def rewrite_chunk(fields):
+        first = on_token is not None and fields["part"] == 1
+        try:
+            return rewrite(CHUNK_PROMPT_TEMPLATE, fields, model, on_token=stream_first if first else None)
+        except Exception as e:
+            print(f"⚠ Error with Ollama AI on part {fields['part']}: {e}")
+            return fields["story"]
+
+    parts = []
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        for part in pool.map(rewrite_chunk, jobs):
+            parts.append(part)
+            if on_token:
+                # The first part already went out as it streamed (unless it failed before any token did)
+                on_token("\n\n" if len(parts) == 1 and streamed else part + "\n\n")
+    return "\n\n".join(parts)
+
+def reformat_story_ollama(story_text, model=OLLAMA_MODEL, prompt_template=PROMPT_TEMPLATE, on_token=None,
+                          chunked=True):
     """
     Rewrite the story using Ollama AI to make it engaging.
+    Talks to the long-lived Ollama server over HTTP; on_token receives the rewrite as it streams in.
+    Responses are cached on disk by model, prompt template and input text. Stories longer than
+    MAX_SINGLE_PROMPT_WORDS are rewritten chunk by chunk when chunked=True, otherwise truncated.
     """
-    story_text = " ".join(story_text.split()[:500])
-    prompt = f"Rewrite this Reddit story to make it engaging, suspenseful, and suitable for narration:\n\n{story_text}"
+    if chunked and len(story_text.split()) > MAX_SINGLE_PROMPT_WORDS:
+        return reformat_story_chunked(story_text, model, on_token=on_token)
+
+    story_text = " ".join(story_text.split()[:MAX_SINGLE_PROMPT_WORDS])
     
     try:
-        result = subprocess.run(
-            ["ollama", "run", "mistral", prompt],
-            capture_output=True,
-            text=True
-        )
-        return result.stdout.strip()
+        return rewrite(prompt_template, {"story": story_text}, model, on_token=on_token)
     except Exception as e:
         print(f"⚠ Error with Ollama AI: {e}")
         return story_text
 
+def reformat_stories_ollama(stories, model=OLLAMA_MODEL, prompt_template=PROMPT_TEMPLATE, concurrency=CONCURRENCY):
+    """
+    Rewrite several stories with up to `concurrency` requests in flight, keeping their order.
+    """
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        return list(pool.map(lambda story: reformat_story_ollama(story, model, prompt_template), stories))
 
 # import os
 # import json
@@ -0,0 +1,188 @@
+import math
+import os
+import subprocess
+import tempfile
+from tqdm import tqdm
+import tracing
+from media import probe_media, scaled_width
+
+RESULTS_DIR = "results"
+
+# Same look as the moviepy TextClips in create_video
+TITLE_STYLE = {"font": "Arial", "fontsize": 70, "color": "white", "stroke_width": 4, "y": 50,
+               "duration": 4, "fade_in": 1.0, "fade_out": 0.0}
+SUBTITLE_STYLE = {"font": "Arial", "fontsize": 50, "color": "yellow", "stroke_width": 3, "y_from_bottom": 200,
+                  "fade_in": 0.5, "fade_out": 0.5}
+
+# ASS colours are &HAABBGGRR
+ASS_COLORS = {
+    "white": "&H00FFFFFF",
+    "yellow": "&H0000FFFF",
+    "black": "&H00000000",
+}
+
+def render_threads():
+    """
+    Cores one render may use: RENDER_THREADS from the environment when several renders share the machine
+    (batch jobs each get a share), otherwise all of them.
+    """
+    return int(os.environ.get("RENDER_THREADS") or 0) or os.cpu_count() or 1
+
+def ensure_dir(directory):
+    """ Ensure that a directory exists """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+def format_ass_time(seconds):
+    """ Format seconds as an ASS timestamp (H:MM:SS.cc) """
+    centiseconds = int(round(max(seconds, 0) * 100))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    secs, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+
+def escape_ass_text(text):
+    """ Escape characters that ASS would treat as override tags """
+    return text.replace("\\", "\\\\").replace("{", "(").replace("}", ")").replace("\n", "\\N")
+
+def escape_filter_path(path):
+    """ Escape a file path for use inside an ffmpeg filter argument """
+    return path.replace("\\", "/").replace(":", "\\:").replace("'", "\\'")
+
+def ass_dialogue(start, end, style, x, y, text, fade_in, fade_out):
+    """ Build a single ASS Dialogue line anchored top-centre at (x, y) """
+    tags = f"{{\\an8\\pos({x},{y})\\fad({int(fade_in * 1000)},{int(fade_out * 1000)})}}"
+    return f"Dialogue: 0,{format_ass_time(start)},{format_ass_time(end)},{style},,0,0,0,,{tags}{escape_ass_text(text)}"
+
+def build_ass_subtitles(title, phrases, width, height, output_file, fades=True, title_y=None, subtitle_y=None):
+    """
+    Write the title card and timed phrases as an ASS subtitle file.
+    Phrases are (start_time, text, duration) tuples from split_text_with_voice_timing, optionally followed by
+    (fade_in, fade_out) flags to turn off the fade at an edge where a phrase was cut between segments.
+    width/height set the script's coordinate space; libass scales it to whatever size the video is rendered at.
+    title_y/subtitle_y override the default caption placement (top of the text, in pixels).
+    """
+    margin = 100  # Text is wrapped to width - 200, same as the moviepy TextClips
+
+    def style_line(name, style):
+        return (f"Style: {name},{style['font']},{style['fontsize']},{ASS_COLORS[style['color']]},"
+                f"{ASS_COLORS[style['color']]},{ASS_COLORS['black']},&H00000000,-1,0,0,0,100,100,0,0,1,"
+                f"{style['stroke_width']},0,8,{margin},{margin},0,1")
+
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "WrapStyle: 0",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, "
+        "Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, "
+        "MarginL, MarginR, MarginV, Encoding",
+        style_line("Title", TITLE_STYLE),
+        style_line("Subtitle", SUBTITLE_STYLE),
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+
+    if title:
+        lines.append(ass_dialogue(0, TITLE_STYLE["duration"], "Title", width // 2,
+                                  TITLE_STYLE["y"] if title_y is None else title_y, title,
+                                  TITLE_STYLE["fade_in"] if fades else 0, TITLE_STYLE["fade_out"] if fades else 0))
+
+    if subtitle_y is None:
+        subtitle_y = height - SUBTITLE_STYLE["y_from_bottom"]
+    for start_time, text, duration, *edges in phrases:
+        fade_in, fade_out = edges or (True, True)
+        lines.append(ass_dialogue(start_time, start_time + duration, "Subtitle", width // 2, subtitle_y, text,
+                                  SUBTITLE_STYLE["fade_in"] if fades and fade_in else 0,
+                                  SUBTITLE_STYLE["fade_out"] if fades and fade_out else 0))
+
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+    return output_file
+
+def run_ffmpeg_with_progress(command, total_frames, desc="Rendering Video"):
+    """
+    Run an ffmpeg command with a frame progress bar showing the real encode rate (frames/s), read from
+    ffmpeg's -progress output. Returns (returncode, stderr text).
+    """
+    command = command[:1] + ["-progress", "pipe:1", "-nostats"] + command[1:]
+    # stderr goes to a file so a full pipe can't stall ffmpeg while we read progress from stdout
+    with tempfile.TemporaryFile() as log, tqdm(total=total_frames, desc=desc, unit="frame") as pbar:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=log, text=True)
+        for line in process.stdout:
+            key, _, value = line.strip().partition("=")
+            if key == "frame" and value.isdigit():
+                pbar.update(min(int(value), total_frames) - pbar.n)
+        tracing.wait(process)
+        log.seek(0)
+        return process.returncode, log.read().decode(errors="ignore")
+
+def create_video_ffmpeg(background, audio, output_file=None, title="Reddit Story", story_text="",
+                        height=720, fps=24, preset="ultrafast", timing_map=None):
+    """
+    Render the final video in a single FFmpeg pass: scale, loop/trim, burn in subtitles and mux the voiceover.
+    """
+    from create_video import split_text_with_voice_timing
+
+    ensure_dir(RESULTS_DIR)
+
+    if output_file is None:
+        output_file = os.path.join(RESULTS_DIR, "final_video.mp4")
+
+    print("🎬 Rendering video with FFmpeg (single pass)...")
+
+    if not story_text:
+        print("⚠ No captions provided!")
+
+    if not os.path.exists(background) or os.path.getsize(background) < 1000:
+        print("❌ Background video file is missing or too small.")
+        return None
+
+    src_width, src_height, _ = probe_media(background)
+    _, _, audio_duration = probe_media(audio)
+
+    if src_width == 0 or src_height == 0:
+        print("❌ Error: Video width or height is 0.")
+        return None
+
+    if audio_duration == 0:
+        print("❌ Error: Invalid audio file.")
+        return None
+
+    width = scaled_width(src_width, src_height, height)
+    phrases = split_text_with_voice_timing(story_text, audio_duration, timing_map=timing_map)
+    subtitle_file = os.path.splitext(output_file)[0] + ".ass"
+    build_ass_subtitles(title, phrases, width, height, subtitle_file)
+
+    video_filter = f"scale={width}:{height},fps={fps},subtitles=filename='{escape_filter_path(subtitle_file)}'"
+
+    command = [
+        "ffmpeg", "-y",
+        "-stream_loop", "-1", "-i", background,  # Loop the background at the demuxer, trimmed by -t below
+        "-i", audio,
+        "-filter_complex", f"[0:v]{video_filter}[v]",
+        "-map", "[v]", "-map", "1:a",
+        "-t", f"{audio_duration:.3f}",
+        "-c:v", "libx264", "-preset", preset, "-pix_fmt", "yuv420p",
+        "-threads", str(render_threads()),
+        "-c:a", "aac", "-b:a", "192k",
+        "-movflags", "+faststart",
+        output_file
+    ]
+
+    total_frames = math.ceil(audio_duration * fps)
+    with tracing.span("encode", engine="ffmpeg", frames=total_frames):
+        returncode, errors = run_ffmpeg_with_progress(command, total_frames)
+
+    if returncode == 0 and os.path.exists(output_file) and os.path.getsize(output_file) > 1000:
+        print("✅ Video Created Successfully:", output_file)
+        return output_file
+
+    print(f"❌ Error creating video: {errors[-2000:]}")
+    return None
@@ -0,0 +1,140 @@
+import math
+import os
+import subprocess
+import time
+from media import probe_media, scaled_width
+from render_ffmpeg import build_ass_subtitles, escape_filter_path
+import tracing
+
+RESULTS_DIR = os.path.join("results", "hls")
+
+SEGMENT_SECONDS = 4
+PLAYLIST_NAME = "playlist.m3u8"
+POLL_SECONDS = 0.5
+
+def ensure_dir(directory):
+    """ Ensure that a directory exists """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+def ready_segments(playlist_file):
+    """
+    Segments listed in the playlist, in order. ffmpeg only lists a segment once it is complete and renames
+    both segment and playlist into place (hls_flags temp_file), so everything returned here is safe to upload.
+    """
+    if not os.path.exists(playlist_file):
+        return []
+    directory = os.path.dirname(playlist_file)
+    segments = []
+    with open(playlist_file, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("#EXT-X-MAP:"):
+                uri = line.split('URI="', 1)[1].split('"', 1)[0]
+                segments.append(os.path.join(directory, uri))
+            elif line and not line.startswith("#"):
+                segments.append(os.path.join(directory, line))
+    return segments
+
+def create_video_hls(background, audio, output_dir=None, title="Reddit Story", story_text="", height=720, fps=24,
+                     preset="ultrafast", segment_seconds=SEGMENT_SECONDS, output_format="hls", on_segment=None,
+                     timing_map=None):
+    """
+    Render in a single FFmpeg pass like create_video_ffmpeg, but stream the result out while it encodes:
+    output_format="hls" writes fMP4 HLS segments plus an EVENT playlist that grows as segments finish,
+    output_format="fmp4" writes one fragmented MP4 (no moov at the end) that can be read while it grows.
+    on_segment(path) is called for each HLS segment (init segment first) as soon as it is ready.
+    Returns the playlist (or MP4) path, or None.
+    """
+    from create_video import split_text_with_voice_timing
+
+    if output_dir is None:
+        output_dir = RESULTS_DIR
+    ensure_dir(output_dir)
+
+    print("📡 Rendering video as a live stream of segments...")
+
+    if not story_text:
+        print("⚠ No captions provided!")
+
+    if not os.path.exists(background) or os.path.getsize(background) < 1000:
+        print("❌ Background video file is missing or too small.")
+        return None
+
+    src_width, src_height, _ = probe_media(background)
+    _, _, audio_duration = probe_media(audio)
+
+    if src_width == 0 or src_height == 0:
+        print("❌ Error: Video width or height is 0.")
+        return None
+
+    if audio_duration == 0:
+        print("❌ Error: Invalid audio file.")
+        return None
+
+    width = scaled_width(src_width, src_height, height)
+    phrases = split_text_with_voice_timing(story_text, audio_duration, timing_map=timing_map)
+    subtitle_file = os.path.join(output_dir, "subtitles.ass")
+    build_ass_subtitles(title, phrases, width, height, subtitle_file)
+
+    video_filter = f"scale={width}:{height},fps={fps},subtitles=filename='{escape_filter_path(subtitle_file)}'"
+
+    command = [
+        "ffmpeg", "-y",
+        "-stream_loop", "-1", "-i", background,
+        "-i", audio,
+        "-filter_complex", f"[0:v]{video_filter}[v]",
+        "-map", "[v]", "-map", "1:a",
+        "-t", f"{audio_duration:.3f}",
+        "-c:v", "libx264", "-preset", preset, "-pix_fmt", "yuv420p",
+        # A keyframe at every segment boundary so each segment starts cleanly
+        "-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})",
+        "-c:a", "aac", "-b:a", "192k",
+    ]
+
+    if output_format == "fmp4":
+        output_file = os.path.join(output_dir, "final_video.mp4")
+        command += ["-movflags", "+frag_keyframe+empty_moov+default_base_moof",
+                    "-frag_duration", str(int(segment_seconds * 1000000)), output_file]
+    else:
+        output_file = os.path.join(output_dir, PLAYLIST_NAME)
+        command += [
+            "-f", "hls",
+            "-hls_time", str(segment_seconds),
+            "-hls_playlist_type", "event",
+            "-hls_segment_type", "fmp4",
+            "-hls_fmp4_init_filename", "init.mp4",
+            "-hls_segment_filename", os.path.join(output_dir, "segment_%05d.m4s"),
+            # Segments and playlist are written to .tmp files and renamed when complete
+            "-hls_flags", "temp_file+independent_segments",
+            output_file
+        ]
+
+    # stderr goes to a file: a pipe nobody reads while we poll could fill up and stall ffmpeg
+    log_file = os.path.join(output_dir, "ffmpeg.log")
+    with open(log_file, "wb") as log, \
+            tracing.span("encode", engine=output_format, frames=math.ceil(audio_duration * fps)):
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=log)
+
+        announced = 0
+        if on_segment is not None and output_format != "fmp4":
+            # Hand finished segments to the uploader while the rest is still encoding
+            while tracing.poll(process) is None:
+                time.sleep(POLL_SECONDS)
+                segments = ready_segments(output_file)
+                for path in segments[announced:]:
+                    on_segment(path)
+                announced = max(announced, len(segments))
+        tracing.wait(process)
+
+    if process.returncode != 0 or not os.path.exists(output_file):
+        with open(log_file, "r", encoding="utf-8", errors="ignore") as f:
+            print(f"❌ Error creating video: {f.read()[-2000:]}")
+        return None
+
+    if on_segment is not None and output_format != "fmp4":
+        for path in ready_segments(output_file)[announced:]:
+            on_segment(path)
+
+    print("✅ Video Created Successfully:", output_file)
+    return output_file
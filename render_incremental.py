@@ -0,0 +1,247 @@
+import hashlib
+import json
+import math
+import os
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from audio_analysis import SAMPLE_RATE, SENTENCE_END, decode_pcm
+from media import probe_media, scaled_width
+from render_ffmpeg import RESULTS_DIR, SUBTITLE_STYLE, TITLE_STYLE, build_ass_subtitles, ensure_dir, render_threads
+from render_parallel import concat_segments, render_segment, slice_phrases
+
+SEGMENT_SECONDS = 6  # Small segments so an edit only invalidates a few seconds of video
+MANIFEST_NAME = "manifest.json"
+AUDIO_NAME = "voiceover.wav"
+
+def fixed_segments(total_frames, fps, segment_seconds=SEGMENT_SECONDS, gop_seconds=2):
+    """ (start_frame, frame_count) for segments of segment_seconds, rounded to whole GOPs """
+    gop = max(int(fps * gop_seconds), 1)
+    size = max(round(segment_seconds * fps / gop), 1) * gop
+    return [(start, min(size, total_frames - start)) for start in range(0, total_frames, size)]
+
+def sentence_segments(phrases, duration, fps, segment_seconds=SEGMENT_SECONDS, first_seconds=0.0):
+    """
+    (start, end, frame_count) for segments cut where a sentence ends, once a segment is at least
+    segment_seconds long (the first one at least first_seconds too). Each segment gets its own whole number
+    of frames, so its length depends only on the speech inside it and not on where it starts.
+    """
+    cuts = [0.0]
+    for (_, text, _), (next_start, _, _) in zip(phrases, phrases[1:]):
+        minimum = segment_seconds if len(cuts) > 1 else max(segment_seconds, first_seconds)
+        if SENTENCE_END.search(text) and next_start - cuts[-1] >= minimum and duration - next_start >= 1 / fps:
+            cuts.append(next_start)
+    cuts.append(duration)
+    return [(start, end, max(round((end - start) * fps), 1)) for start, end in zip(cuts, cuts[1:])]
+
+def background_identity(path):
+    """ Cheap identity for the background file; a replaced or re-downloaded clip gets a new one """
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+def relative_phrases(phrases, start, end):
+    """
+    The phrases on screen in [start, end), clipped to it and timed from its start, as
+    (start, text, duration, fade_in, fade_out): a phrase running across the cut does not fade at that edge,
+    so it stays on screen from one segment into the next.
+    """
+    return [(round(max(t - start, 0.0), 3), text, round(min(t + d, end) - max(t, start), 3),
+             t >= start, t + d <= end)
+            for t, text, d in slice_phrases(phrases, start, end)]
+
+def retime_audio(audio, segments, fps, output_file, sample_rate=SAMPLE_RATE):
+    """
+    Cut the voiceover at the segment boundaries (the start of a sentence, after a pause) and trim or
+    silence-pad each piece to its segment's whole frames, so the audio stays on the captions segment by segment.
+    """
+    pcm_file = f"{output_file}.{os.getpid()}.pcm"
+    tmp_file = f"{output_file}.{os.getpid()}.tmp.wav"
+    try:
+        samples = decode_pcm(audio, pcm_file, sample_rate)
+        with wave.open(tmp_file, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            frames_done, written = 0, 0
+            for start, end, frames in segments:
+                frames_done += frames
+                target = round(frames_done * sample_rate / fps) - written
+                first = int(round(start * sample_rate))
+                piece = np.asarray(samples[first:min(int(round(end * sample_rate)), first + target)], dtype=np.int16)
+                wav.writeframes(piece.tobytes() + bytes(2 * (target - len(piece))))
+                written += target
+        del samples
+        os.replace(tmp_file, output_file)
+    finally:
+        for path in (pcm_file, tmp_file):
+            if os.path.exists(path):
+                os.remove(path)
+    return output_file
+
+def segment_key(subtitle_file, params):
+    """ Hash of everything that determines a segment's pixels: its caption script and the render settings """
+    digest = hashlib.sha256()
+    with open(subtitle_file, "rb") as f:
+        digest.update(f.read())
+    digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+def load_manifest(work_dir):
+    path = os.path.join(work_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"segments": []}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {"segments": []}
+
+def save_manifest(work_dir, manifest):
+    path = os.path.join(work_dir, MANIFEST_NAME)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def create_video_incremental(background, audio, output_file=None, title="Reddit Story", story_text="",
+                             height=720, fps=24, gop_seconds=2, segment_seconds=SEGMENT_SECONDS,
+                             preset="ultrafast", workers=None, timing_map=None, work_dir=None):
+    """
+    Render like create_video_parallel, but keep the encoded segments in work_dir (default: next to the output)
+    together with a manifest of the title and phrases each one shows. On the next render into the same work_dir,
+    only segments whose captions (or render settings) changed are re-encoded; the rest are stream-copied as
+    they are. Pass a work_dir that outlives the output path when the output is a temporary file.
+    With a timing_map, segments are cut at sentence starts and keyed on captions timed from their own start,
+    so editing a sentence re-encodes only the segment it is in even though everything after it moves; the
+    voiceover is re-cut at the same points to match. Without one, segments are a fixed length.
+    """
+    from create_video import split_text_with_voice_timing
+
+    ensure_dir(RESULTS_DIR)
+
+    if output_file is None:
+        output_file = os.path.join(RESULTS_DIR, "final_video.mp4")
+
+    if not story_text:
+        print("⚠ No captions provided!")
+
+    if not os.path.exists(background) or os.path.getsize(background) < 1000:
+        print("❌ Background video file is missing or too small.")
+        return None
+
+    src_width, src_height, background_duration = probe_media(background)
+    _, _, audio_duration = probe_media(audio)
+
+    if src_width == 0 or src_height == 0:
+        print("❌ Error: Video width or height is 0.")
+        return None
+
+    if audio_duration == 0:
+        print("❌ Error: Invalid audio file.")
+        return None
+
+    width = scaled_width(src_width, src_height, height)
+    phrases = split_text_with_voice_timing(story_text, audio_duration, timing_map=timing_map)
+    if timing_map:
+        segments = sentence_segments(phrases, audio_duration, fps, segment_seconds, TITLE_STYLE["duration"])
+    else:
+        segments = [(start_frame / fps, (start_frame + frames) / fps, frames) for start_frame, frames
+                    in fixed_segments(math.ceil(audio_duration * fps), fps, segment_seconds, gop_seconds)]
+    gop = max(int(fps * gop_seconds), 1)
+
+    if work_dir is None:
+        work_dir = os.path.splitext(output_file)[0] + "_segments"
+    ensure_dir(work_dir)
+    previous = {entry["key"]: entry for entry in load_manifest(work_dir)["segments"]}
+
+    params = {
+        "background": background_identity(background),
+        "width": width, "height": height, "fps": fps, "gop": gop, "preset": preset,
+        "styles": [TITLE_STYLE, SUBTITLE_STYLE],
+    }
+
+    entries, jobs, claimed = [], [], {}
+    start_frame = 0
+    for index, (start, end, frames) in enumerate(segments):
+        # The title is drawn from time 0 of the first segment, which is at least the title's duration long
+        segment_title = title if index == 0 else ""
+        segment_phrases = relative_phrases(phrases, start, end)
+
+        subtitle_file = os.path.join(work_dir, f"segment_{index:04d}.ass")
+        build_ass_subtitles(segment_title, segment_phrases, width, height, subtitle_file)
+        key = segment_key(subtitle_file, dict(params, frames=frames))
+        segment_file = os.path.join(work_dir, f"segment_{key}.mp4")
+
+        # A segment that was already encoded keeps the stretch of background it was encoded with
+        if key in claimed:
+            background_offset = claimed[key]["background_offset"]
+        elif key in previous and "background_offset" in previous[key] and os.path.exists(segment_file):
+            background_offset = previous[key]["background_offset"]
+        else:
+            background_offset = round(start % background_duration if background_duration > 0 else 0.0, 3)
+            jobs.append({
+                "index": index,
+                "background": background,
+                "background_duration": background_duration,
+                "background_offset": background_offset,
+                "subtitle_file": subtitle_file,
+                "subtitle_start": 0.0,
+                "output_file": segment_file,
+                "start_frame": start_frame,
+                "frames": frames,
+                "width": width,
+                "height": height,
+                "fps": fps,
+                "gop": gop,
+                "preset": preset,
+                "threads": 0,
+            })
+
+        entries.append({
+            "index": index,
+            "start_frame": start_frame,
+            "frames": frames,
+            "background_offset": background_offset,
+            "title": segment_title,
+            "phrases": [list(phrase) for phrase in segment_phrases],
+            "key": key,
+            "file": os.path.basename(segment_file),
+        })
+        claimed.setdefault(key, entries[-1])
+        start_frame += frames
+
+    print(f"🎬 Incremental render: re-encoding {len(jobs)} of {len(entries)} segments...")
+
+    if jobs:
+        workers = min(workers or render_threads(), len(jobs))
+        for job in jobs:
+            job["threads"] = max(render_threads() // workers, 1)
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(render_segment, jobs))
+        except Exception as e:
+            print(f"❌ Error creating video: {e}")
+            return None
+
+    if timing_map:
+        audio = retime_audio(audio, segments, fps, os.path.join(work_dir, AUDIO_NAME))
+
+    segment_files = [os.path.join(work_dir, entry["file"]) for entry in entries]
+    process = concat_segments(segment_files, audio, output_file, work_dir)
+
+    if process.returncode != 0 or not os.path.exists(output_file) or os.path.getsize(output_file) <= 1000:
+        print(f"❌ Error joining segments: {process.stderr.decode(errors='ignore')[-2000:]}")
+        return None
+
+    save_manifest(work_dir, {"output_file": output_file, "segments": entries})
+
+    # Segments no longer referenced by the manifest will never be reused, so work_dir holds one render at most
+    keep = {entry["file"] for entry in entries} | {f"segment_{index:04d}.ass" for index in range(len(entries))}
+    for name in os.listdir(work_dir):
+        if name.startswith("segment_") and name.endswith((".mp4", ".ass")) and name not in keep:
+            os.remove(os.path.join(work_dir, name))
+
+    print("✅ Video Created Successfully:", output_file)
+    return output_file
@@ -0,0 +1,162 @@
+import math
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+from media import probe_media, scaled_width
+from render_ffmpeg import RESULTS_DIR, TITLE_STYLE, build_ass_subtitles, ensure_dir, escape_filter_path, render_threads
+
+def plan_segments(total_frames, fps, workers, gop_seconds=2):
+    """
+    Split the timeline into at most `workers` segments whose lengths are whole GOPs.
+    Returns a list of (start_frame, frame_count) tuples.
+    """
+    gop = max(int(fps * gop_seconds), 1)
+    total_gops = max(math.ceil(total_frames / gop), 1)
+    count = max(min(workers, total_gops), 1)
+    gops_per_segment = math.ceil(total_gops / count)
+
+    segments = []
+    start = 0
+    while start < total_frames:
+        frames = min(gops_per_segment * gop, total_frames - start)
+        segments.append((start, frames))
+        start += frames
+    return segments
+
+def slice_phrases(phrases, start, end):
+    """ Keep only the phrases that are on screen somewhere in [start, end) """
+    return [(t, text, d) for t, text, d in phrases if t < end and t + d > start]
+
+def render_segment(job):
+    """ Render one video-only segment with its own slice of the subtitles """
+    start = job["start_frame"] / job["fps"]
+    offset = job.get("background_offset", start % job["background_duration"] if job["background_duration"] > 0 else 0)
+    subtitle_start = job.get("subtitle_start", start)  # 0 for a subtitle file timed from the segment's start
+
+    # Shift frame timestamps onto the full timeline so the subtitle slice keeps its original times
+    video_filter = (f"scale={job['width']}:{job['height']},fps={job['fps']},"
+                    f"setpts=PTS+{subtitle_start:.6f}/TB,"
+                    f"subtitles=filename='{escape_filter_path(job['subtitle_file'])}',"
+                    f"setpts=PTS-STARTPTS")
+
+    command = [
+        "ffmpeg", "-y",
+        "-ss", f"{offset:.6f}", "-stream_loop", "-1", "-i", job["background"],
+        "-filter_complex", f"[0:v]{video_filter}[v]",
+        "-map", "[v]", "-an",
+        "-frames:v", str(job["frames"]),
+        "-c:v", "libx264", "-preset", job["preset"], "-pix_fmt", "yuv420p",
+        "-g", str(job["gop"]), "-keyint_min", str(job["gop"]), "-sc_threshold", "0",
+        "-threads", str(job["threads"]),
+        job["output_file"]
+    ]
+
+    with tracing.span("encode.segment", index=job["index"], frames=job["frames"]):
+        process = tracing.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0 or not os.path.exists(job["output_file"]):
+        raise RuntimeError(f"Segment {job['index']} failed: {process.stderr.decode(errors='ignore')[-1000:]}")
+    return job["output_file"]
+
+def concat_segments(segment_files, audio, output_file, work_dir):
+    """ Join encoded segments with the concat demuxer (no video re-encode) and mux the voiceover """
+    list_file = os.path.join(work_dir, "segments.txt")
+    with open(list_file, "w", encoding="utf-8") as f:
+        for path in segment_files:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+
+    command = [
+        "ffmpeg", "-y",
+        "-f", "concat", "-safe", "0", "-i", list_file,
+        "-i", audio,
+        "-map", "0:v", "-map", "1:a",
+        "-c:v", "copy",
+        "-c:a", "aac", "-b:a", "192k",
+        "-shortest", "-movflags", "+faststart",
+        output_file
+    ]
+    with tracing.span("concat", segments=len(segment_files)):
+        return tracing.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+def create_video_parallel(background, audio, output_file=None, title="Reddit Story", story_text="",
+                          workers=None, height=720, fps=24, gop_seconds=2, preset="ultrafast", timing_map=None):
+    """
+    Render the final video as GOP-aligned segments in parallel FFmpeg processes, then stream-copy concat them.
+    """
+    from create_video import split_text_with_voice_timing
+
+    ensure_dir(RESULTS_DIR)
+
+    if output_file is None:
+        output_file = os.path.join(RESULTS_DIR, "final_video.mp4")
+
+    workers = workers or render_threads()
+    print(f"🎬 Rendering video in parallel segments ({workers} workers)...")
+
+    if not story_text:
+        print("⚠ No captions provided!")
+
+    if not os.path.exists(background) or os.path.getsize(background) < 1000:
+        print("❌ Background video file is missing or too small.")
+        return None
+
+    src_width, src_height, background_duration = probe_media(background)
+    _, _, audio_duration = probe_media(audio)
+
+    if src_width == 0 or src_height == 0:
+        print("❌ Error: Video width or height is 0.")
+        return None
+
+    if audio_duration == 0:
+        print("❌ Error: Invalid audio file.")
+        return None
+
+    width = scaled_width(src_width, src_height, height)
+    phrases = split_text_with_voice_timing(story_text, audio_duration, timing_map=timing_map)
+    total_frames = math.ceil(audio_duration * fps)
+    segments = plan_segments(total_frames, fps, workers, gop_seconds)
+
+    work_dir = os.path.splitext(output_file)[0] + "_segments"
+    ensure_dir(work_dir)
+
+    jobs = []
+    for index, (start_frame, frames) in enumerate(segments):
+        start, end = start_frame / fps, (start_frame + frames) / fps
+        subtitle_file = os.path.join(work_dir, f"segment_{index:04d}.ass")
+        build_ass_subtitles(title if start < TITLE_STYLE["duration"] else "",
+                            slice_phrases(phrases, start, end), width, height, subtitle_file)
+        jobs.append({
+            "index": index,
+            "background": background,
+            "background_duration": background_duration,
+            "subtitle_file": subtitle_file,
+            "output_file": os.path.join(work_dir, f"segment_{index:04d}.mp4"),
+            "start_frame": start_frame,
+            "frames": frames,
+            "width": width,
+            "height": height,
+            "fps": fps,
+            "gop": max(int(fps * gop_seconds), 1),
+            "preset": preset,
+            "threads": max(render_threads() // len(segments), 1),
+        })
+
+    try:
+        # Each segment is its own ffmpeg process, so a thread per segment is enough to keep every core busy
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            segment_files = list(pool.map(render_segment, jobs))
+    except Exception as e:
+        print(f"❌ Error creating video: {e}")
+        return None
+
+    process = concat_segments(segment_files, audio, output_file, work_dir)
+
+    if process.returncode == 0 and os.path.exists(output_file) and os.path.getsize(output_file) > 1000:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        print("✅ Video Created Successfully:", output_file)
+        return output_file
+
+    print(f"❌ Error joining segments: {process.stderr.decode(errors='ignore')[-2000:]}")
+    return None
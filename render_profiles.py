@@ -0,0 +1,140 @@
+import os
+import subprocess
+import math
+from media import probe_media
+from render_ffmpeg import build_ass_subtitles, escape_filter_path, render_threads
+import tracing
+
+RESULTS_DIR = "results"
+
+# crop: "center" fills the frame and crops the overflow, "fit" letterboxes, "blur" letterboxes over a blurred
+# fill of the same footage. Caption positions are the top of the text in output pixels.
+OUTPUT_PROFILES = {
+    "shorts": {"width": 720, "height": 1280, "crop": "center", "video_bitrate": "3500k",
+               "title_y": 220, "subtitle_y_from_bottom": 460},  # Clear of the Shorts/TikTok UI
+    "landscape": {"width": 1280, "height": 720, "crop": "center", "video_bitrate": "4000k",
+                  "title_y": 50, "subtitle_y_from_bottom": 200},
+    "square": {"width": 720, "height": 720, "crop": "center", "video_bitrate": "2500k",
+               "title_y": 50, "subtitle_y_from_bottom": 200},
+}
+
+def ensure_dir(directory):
+    """ Ensure that a directory exists """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+def resolve_profiles(profiles):
+    """ Accept profile names or (name, dict) pairs / a dict of profiles; return [(name, profile)] """
+    if isinstance(profiles, dict):
+        profiles = list(profiles.items())
+    resolved = []
+    for profile in profiles:
+        if isinstance(profile, str):
+            resolved.append((profile, OUTPUT_PROFILES[profile]))
+        else:
+            resolved.append(profile)
+    return resolved
+
+def reframe_filter(label, profile, output_label):
+    """ Filter chain taking [label] to the profile's frame size with its crop strategy """
+    width, height = profile["width"], profile["height"]
+    aspect = width / height
+
+    if profile.get("crop", "center") == "fit":
+        return (f"[{label}]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1[{output_label}]")
+
+    if profile.get("crop") == "blur":
+        return (f"[{label}]split[{label}bg][{label}fg];"
+                f"[{label}bg]scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},"
+                f"boxblur=20[{label}fill];"
+                f"[{label}fg]scale={width}:{height}:force_original_aspect_ratio=decrease[{label}fit];"
+                f"[{label}fill][{label}fit]overlay=(W-w)/2:(H-h)/2,setsar=1[{output_label}]")
+
+    return (f"[{label}]crop='min(iw,trunc(ih*{aspect:.6f}/2)*2)':'min(ih,trunc(iw/{aspect:.6f}/2)*2)',"
+            f"scale={width}:{height},setsar=1[{output_label}]")
+
+def create_video_profiles(background, audio, profiles, output_file=None, title="Reddit Story", story_text="",
+                          fps=24, preset="ultrafast", timing_map=None):
+    """
+    Render several aspect ratios from one job: the background and voiceover are decoded once, split in the
+    filter graph and fed to one encoder per profile inside a single FFmpeg process.
+    Returns {profile name: output path} for the outputs that were written.
+    """
+    from create_video import split_text_with_voice_timing
+
+    ensure_dir(RESULTS_DIR)
+
+    if output_file is None:
+        output_file = os.path.join(RESULTS_DIR, "final_video.mp4")
+
+    profiles = resolve_profiles(profiles)
+    print(f"🎬 Rendering {len(profiles)} formats from one decode: {', '.join(name for name, _ in profiles)}")
+
+    if not story_text:
+        print("⚠ No captions provided!")
+
+    if not os.path.exists(background) or os.path.getsize(background) < 1000:
+        print("❌ Background video file is missing or too small.")
+        return {}
+
+    src_width, src_height, _ = probe_media(background)
+    _, _, audio_duration = probe_media(audio)
+
+    if src_width == 0 or src_height == 0:
+        print("❌ Error: Video width or height is 0.")
+        return {}
+
+    if audio_duration == 0:
+        print("❌ Error: Invalid audio file.")
+        return {}
+
+    # Subtitle timings depend only on the story and the voiceover, so every format shares them
+    phrases = split_text_with_voice_timing(story_text, audio_duration, timing_map=timing_map)
+    base, ext = os.path.splitext(output_file)
+
+    graph = [f"[0:v]fps={fps},split={len(profiles)}" + "".join(f"[src{i}]" for i in range(len(profiles)))]
+    outputs = {}
+    output_args = []
+    for i, (name, profile) in enumerate(profiles):
+        width, height = profile["width"], profile["height"]
+        subtitle_file = f"{base}_{name}.ass"
+        build_ass_subtitles(title, phrases, width, height, subtitle_file,
+                            title_y=profile.get("title_y"),
+                            subtitle_y=height - profile.get("subtitle_y_from_bottom", 200))
+
+        graph.append(reframe_filter(f"src{i}", profile, f"framed{i}"))
+        graph.append(f"[framed{i}]subtitles=filename='{escape_filter_path(subtitle_file)}'[v{i}]")
+
+        outputs[name] = f"{base}_{name}{ext or '.mp4'}"
+        bitrate = profile.get("video_bitrate", "4000k")
+        output_args += [
+            "-map", f"[v{i}]", "-map", "1:a",
+            "-t", f"{audio_duration:.3f}",
+            "-c:v", "libx264", "-preset", preset, "-pix_fmt", "yuv420p",
+            "-b:v", bitrate, "-maxrate", bitrate, "-bufsize", bitrate,
+            "-c:a", "aac", "-b:a", profile.get("audio_bitrate", "192k"),
+            "-movflags", "+faststart",
+            outputs[name]
+        ]
+
+    command = [
+        "ffmpeg", "-y",
+        "-stream_loop", "-1", "-i", background,
+        "-i", audio,
+        "-filter_complex", ";".join(graph),
+        "-threads", str(render_threads()),
+    ] + output_args
+
+    with tracing.span("encode", engine="profiles", profiles=len(profiles), frames=math.ceil(audio_duration * fps)):
+        process = tracing.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    written = {name: path for name, path in outputs.items()
+               if os.path.exists(path) and os.path.getsize(path) > 1000}
+    if process.returncode == 0 and len(written) == len(outputs):
+        for name, path in written.items():
+            print(f"✅ {name} Created Successfully:", path)
+        return written
+
+    print(f"❌ Error creating videos: {process.stderr.decode(errors='ignore')[-2000:]}")
+    return written if process.returncode == 0 else {}
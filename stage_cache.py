@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to unlocked manifest updates
+    fcntl = None
+
+STAGE_CACHE_DIR = os.path.join("cache", "stages")
+MANIFEST_NAME = "manifest.json"
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3  # 5 GB
+STALE_PART_SECONDS = 24 * 3600  # Unfinished downloads nobody resumed within this long are swept
+
+def ensure_dir(directory):
+    """ Ensure that a directory exists """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+def stage_key(stage, **inputs):
+    """
+    Content-addressed key for a stage: a hash of the stage name and every input/parameter that affects its output.
+    """
+    payload = json.dumps({"stage": stage, "inputs": inputs}, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{stage}-{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]}"
+
+class ManifestLock:
+    """ Exclusive lock around manifest read-modify-write so concurrent jobs don't lose entries """
+
+    def __init__(self, cache_dir):
+        self.path = os.path.join(cache_dir, MANIFEST_NAME + ".lock")
+        self.handle = None
+
+    def __enter__(self):
+        self.handle = open(self.path, "a")
+        if fcntl:
+            fcntl.flock(self.handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+        self.handle.close()
+
+class KeyLock(ManifestLock):
+    """
+    Exclusive lock for producing one key: concurrent jobs that need the same artifact (e.g. a background
+    download) wait for the first one and then find it in the cache instead of producing it again.
+    """
+
+    def __init__(self, key, cache_dir=STAGE_CACHE_DIR):
+        lock_dir = os.path.join(cache_dir, "locks")
+        ensure_dir(lock_dir)
+        self.path = os.path.join(lock_dir, f"{key}.lock")
+        self.handle = None
+
+def load_manifest(cache_dir):
+    """ Read the manifest, treating a missing or corrupt file as empty """
+    path = os.path.join(cache_dir, MANIFEST_NAME)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(cache_dir, manifest):
+    """ Atomically replace the manifest """
+    path = os.path.join(cache_dir, MANIFEST_NAME)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def lookup(key, cache_dir=STAGE_CACHE_DIR):
+    """ Return the cached artifact path for key (and mark it recently used), or None """
+    ensure_dir(cache_dir)
+    with ManifestLock(cache_dir):
+        manifest = load_manifest(cache_dir)
+        entry = manifest.get(key)
+        if entry is None:
+            return None
+
+        path = os.path.join(cache_dir, entry["file"])
+        if not os.path.exists(path) or os.path.getsize(path) != entry["size"]:
+            manifest.pop(key)
+            save_manifest(cache_dir, manifest)
+            return None
+
+        entry["last_access"] = time.time()
+        save_manifest(cache_dir, manifest)
+        return path
+
+def temp_path(key, ext, cache_dir=STAGE_CACHE_DIR):
+    """ A private path inside the cache directory for a stage to write its artifact to before commit() """
+    ensure_dir(cache_dir)
+    return os.path.join(cache_dir, f"{key}.{os.getpid()}.tmp{ext}")
+
+def download_path(key, ext, cache_dir=STAGE_CACHE_DIR):
+    """
+    A stable path inside the cache directory to download key's artifact to before commit(). Unlike temp_path
+    it is the same in every process, so a download interrupted by a crash is resumed (from its .part file) by
+    the next run; hold KeyLock(key) while downloading.
+    """
+    ensure_dir(cache_dir)
+    return os.path.join(cache_dir, f"{key}.download{ext}")
+
+def commit(key, tmp_file, cache_dir=STAGE_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Atomically move a finished artifact into the cache, record it in the manifest and evict down to max_bytes.
+    """
+    ext = os.path.splitext(tmp_file)[1]
+    file_name = key + ext
+    path = os.path.join(cache_dir, file_name)
+    os.replace(tmp_file, path)
+
+    now = time.time()
+    with ManifestLock(cache_dir):
+        manifest = load_manifest(cache_dir)
+        manifest[key] = {"file": file_name, "size": os.path.getsize(path), "created": now, "last_access": now}
+        evict(manifest, cache_dir, max_bytes, keep=key)
+        save_manifest(cache_dir, manifest)
+    return path
+
+def sweep_partial(cache_dir, max_age=STALE_PART_SECONDS):
+    """ Remove .part files (and their .part.json validators) of downloads abandoned more than max_age ago """
+    cutoff = time.time() - max_age
+    for name in os.listdir(cache_dir):
+        if not name.endswith((".part", ".part.json")):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+def evict(manifest, cache_dir, max_bytes, keep=None):
+    """ Drop least-recently-used entries until the cache fits in max_bytes, and sweep abandoned downloads """
+    sweep_partial(cache_dir)
+    total = sum(entry["size"] for entry in manifest.values())
+    for key in sorted(manifest, key=lambda k: manifest[k]["last_access"]):
+        if total <= max_bytes:
+            break
+        if key == keep:
+            continue
+        entry = manifest.pop(key)
+        total -= entry["size"]
+        try:
+            os.remove(os.path.join(cache_dir, entry["file"]))
+        except OSError:
+            pass
+    return total
+
+def read_text(key, cache_dir=STAGE_CACHE_DIR):
+    """ Return a cached text artifact, or None """
+    path = lookup(key, cache_dir)
+    if path is None:
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def write_text(key, data, cache_dir=STAGE_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+    """ Atomically cache a text artifact """
+    tmp_file = temp_path(key, ".txt", cache_dir)
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        f.write(data)
+    return commit(key, tmp_file, cache_dir, max_bytes)
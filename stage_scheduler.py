@@ -0,0 +1,94 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+import tracing
+
+class Stage:
+    """
+    One pipeline step: func(**inputs, **params) produces the named outputs.
+    kind="io" runs on a thread, kind="cpu" runs in a worker process (func and params must be picklable).
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), kind="io", params=None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.kind = kind
+        self.params = params or {}
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, inputs={self.inputs}, outputs={self.outputs}, kind={self.kind!r})"
+
+def call_stage(func, kwargs, name, parent_pid):
+    """
+    Run a stage body inside a trace span and time it (top level so it can be sent to a worker process).
+    Spans recorded in a worker process travel back with the result.
+    """
+    started = time.time()
+    with tracing.span(f"stage.{name}"):
+        result = func(**kwargs)
+    return result, time.time() - started, tracing.take_worker_events(parent_pid)
+
+def check_graph(stages, available):
+    """ Make sure every input is produced by exactly one stage (or supplied up front) """
+    produced = set(available)
+    for stage in stages:
+        for output in stage.outputs:
+            if output in produced:
+                raise ValueError(f"Output {output!r} is produced more than once")
+            produced.add(output)
+
+    for stage in stages:
+        missing = [name for name in stage.inputs if name not in produced]
+        if missing:
+            raise ValueError(f"Stage {stage.name!r} needs {missing} which no stage produces")
+
+def run_stages(stages, values=None, io_workers=8, cpu_workers=None):
+    """
+    Run stages as a dependency graph: each stage starts as soon as all of its inputs exist.
+    Returns a dict with every produced value; raises the first stage error.
+    """
+    values = dict(values or {})
+    check_graph(stages, values)
+
+    pending = list(stages)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=io_workers) as io_pool, \
+            ProcessPoolExecutor(max_workers=cpu_workers or os.cpu_count() or 1) as cpu_pool:
+
+        def submit_ready():
+            for stage in list(pending):
+                if all(name in values for name in stage.inputs):
+                    pending.remove(stage)
+                    kwargs = {name: values[name] for name in stage.inputs}
+                    kwargs.update(stage.params)
+                    pool = cpu_pool if stage.kind == "cpu" else io_pool
+                    running[pool.submit(call_stage, stage.func, kwargs, stage.name, os.getpid())] = stage
+
+        submit_ready()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    result, seconds, worker_events = future.result()
+                except Exception as e:
+                    print(f"❌ Stage {stage.name} failed: {e}")
+                    for other in running:
+                        other.cancel()
+                    raise
+
+                tracing.merge(worker_events)
+                print(f"⏱ {stage.name} finished in {seconds:.1f}s")
+                if len(stage.outputs) == 1:
+                    result = (result,)
+                for name, value in zip(stage.outputs, result or ()):
+                    values[name] = value
+            submit_ready()
+
+    if pending:
+        raise ValueError(f"Stages never became ready: {[stage.name for stage in pending]}")
+
+    return values
@@ -0,0 +1,167 @@
+import hashlib
+import os
+import re
+import sqlite3
+import struct
+import threading
+import numpy as np
+
+# v2: signatures from the earlier (overflowing) hash family are not comparable with the current ones
+DEDUP_DB = os.path.join("cache", "story_dedup_v2.db")
+
+NUM_PERM = 128
+BANDS = 32  # 32 bands x 4 rows: pairs around 0.4+ Jaccard usually share a bucket
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 5
+SIMILARITY_THRESHOLD = 0.8
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    story_id TEXT PRIMARY KEY,
+    signature BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    story_id TEXT NOT NULL,
+    PRIMARY KEY (band, bucket, story_id)
+) WITHOUT ROWID;
+"""
+
+def ensure_dir(directory):
+    """ Ensure that a directory exists """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+def make_permutations(num_perm=NUM_PERM, seed=1):
+    """
+    Fixed (a, b) coefficients for the universal hash family, identical across runs. Shingle hashes are 32-bit
+    and a, b < 2^32, so a * x + b < 2^64 never wraps in uint64 and the mod below is the true (a·x+b) mod p.
+    """
+    a, b = [], []
+    for i in range(num_perm):
+        digest = hashlib.sha256(f"{seed}:{i}".encode()).digest()
+        x, y = struct.unpack("<II", digest[:8])
+        a.append(x % MAX_HASH + 1)
+        b.append(y)
+    return np.array(a, dtype=np.uint64), np.array(b, dtype=np.uint64)
+
+PERM_A, PERM_B = make_permutations()
+
+def shingles(text, size=SHINGLE_WORDS):
+    """ Hashed word n-grams of normalized text """
+    words = re.findall(r"[a-z0-9']+", text.lower())
+    if len(words) < size:
+        words = words + [""] * (size - len(words))
+    grams = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return {struct.unpack("<I", hashlib.blake2b(g.encode(), digest_size=4).digest())[0] for g in grams}
+
+def minhash(text):
+    """ MinHash signature (NUM_PERM 32-bit values) of a story's shingles, vectorized over all permutations """
+    values = np.fromiter(shingles(text), dtype=np.uint64)
+    hashed = (np.outer(values, PERM_A) + PERM_B) % np.uint64(MERSENNE_PRIME) & np.uint64(MAX_HASH)
+    return [int(v) for v in hashed.min(axis=0)]
+
+def band_buckets(signature):
+    """ One bucket hash per LSH band """
+    buckets = []
+    for band in range(BANDS):
+        rows = struct.pack(f"<{ROWS}I", *signature[band * ROWS:(band + 1) * ROWS])
+        buckets.append(struct.unpack("<q", hashlib.blake2b(rows, digest_size=8).digest())[0])
+    return buckets
+
+def similarity(sig_a, sig_b):
+    """ Estimated Jaccard similarity of two signatures """
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+class DedupIndex:
+    """
+    MinHash/LSH index over story text, persisted in SQLite. A lookup only touches the BANDS buckets of the
+    query signature (primary-key probes) and the handful of candidates in them, so it stays fast as the
+    index grows to hundreds of thousands of stories.
+    """
+
+    def __init__(self, db_path=DEDUP_DB):
+        ensure_dir(os.path.dirname(db_path) or ".")
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.RLock()  # One connection shared by the threads of a process
+
+    def close(self):
+        self.conn.close()
+
+    def add(self, story_id, text, signature=None):
+        """ Index a story (replacing any previous entry with the same id) """
+        signature = signature or minhash(text)
+        with self.lock:
+            self.conn.execute("DELETE FROM buckets WHERE story_id = ?", (story_id,))
+            self.conn.execute("INSERT OR REPLACE INTO signatures (story_id, signature) VALUES (?, ?)",
+                              (story_id, struct.pack(f"<{NUM_PERM}I", *signature)))
+            self.conn.executemany("INSERT OR IGNORE INTO buckets (band, bucket, story_id) VALUES (?, ?, ?)",
+                                  [(band, bucket, story_id)
+                                   for band, bucket in enumerate(band_buckets(signature))])
+            self.conn.commit()
+
+    def query(self, text, threshold=SIMILARITY_THRESHOLD, signature=None, exclude=None):
+        """ Return [(story_id, similarity)] of indexed stories at or above threshold, most similar first """
+        signature = signature or minhash(text)
+        candidates = set()
+        with self.lock:
+            for band, bucket in enumerate(band_buckets(signature)):
+                for (story_id,) in self.conn.execute("SELECT story_id FROM buckets WHERE band = ? AND bucket = ?",
+                                                     (band, bucket)):
+                    candidates.add(story_id)
+            candidates.discard(exclude)
+
+            matches = []
+            for story_id in candidates:
+                row = self.conn.execute("SELECT signature FROM signatures WHERE story_id = ?",
+                                        (story_id,)).fetchone()
+                if row is None:
+                    continue
+                score = similarity(signature, struct.unpack(f"<{NUM_PERM}I", row[0]))
+                if score >= threshold:
+                    matches.append((story_id, score))
+        return sorted(matches, key=lambda match: match[1], reverse=True)
+
+    def check_and_add(self, story_id, text, threshold=SIMILARITY_THRESHOLD):
+        """
+        Return the best earlier near-duplicate (story_id, similarity) or None, and index the story either way.
+        """
+        signature = minhash(text)
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")  # Two workers indexing the same repost can't both miss each other
+            matches = self.query(text, threshold, signature=signature, exclude=story_id)
+            self.add(story_id, text, signature=signature)
+        return matches[0] if matches else None
+
+def story_id_for(text):
+    """ Stable id for a story that did not come with a Reddit post id """
+    return "sha256:" + hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_index(db_path=DEDUP_DB):
+    """ The process's shared DedupIndex for db_path (opened, and its schema checked, once per process) """
+    key = (os.getpid(), os.path.abspath(db_path))
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = DedupIndex(db_path)
+        return _indexes[key]
+
+def find_duplicate(text, story_id=None, threshold=SIMILARITY_THRESHOLD, db_path=DEDUP_DB):
+    """
+    Check a story against the index without writing anything; returns (duplicate_id, similarity) or None.
+    Call remember_story once the story is actually used so later reposts of it are caught.
+    """
+    matches = get_index(db_path).query(text, threshold, exclude=story_id or story_id_for(text))
+    return matches[0] if matches else None
+
+def remember_story(text, story_id=None, db_path=DEDUP_DB):
+    """ Add an accepted story to the index """
+    get_index(db_path).add(story_id or story_id_for(text), text)
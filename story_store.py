@@ -0,0 +1,223 @@
+import argparse
+import os
+import sqlite3
+import time
+from story_dedup import DedupIndex
+
+STORY_DB = os.path.join("cache", "stories.db")
+PAGE_SIZE = 100  # Reddit's maximum listing page size; PRAW pages at this size, we write in batches of it
+# Listings whose contents roll over between runs: a saved cursor would skip the new top posts, so these
+# always start from the top (upserts make the overlap harmless)
+ROLLING_TIME_FILTERS = ("hour", "day")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id TEXT PRIMARY KEY,
+    subreddit TEXT NOT NULL,
+    title TEXT NOT NULL,
+    selftext TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    num_comments INTEGER NOT NULL DEFAULT 0,
+    created_utc REAL NOT NULL,
+    url TEXT,
+    fetched REAL NOT NULL,
+    used INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS posts_pick ON posts (used, score DESC);
+CREATE INDEX IF NOT EXISTS posts_subreddit ON posts (subreddit, used, score DESC);
+CREATE INDEX IF NOT EXISTS posts_created ON posts (created_utc);
+CREATE TABLE IF NOT EXISTS cursors (
+    subreddit TEXT NOT NULL,
+    time_filter TEXT NOT NULL,
+    after TEXT,
+    updated REAL NOT NULL,
+    PRIMARY KEY (subreddit, time_filter)
+);
+"""
+
+UPSERT = """
+INSERT INTO posts (id, subreddit, title, selftext, score, num_comments, created_utc, url, fetched)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    title = excluded.title,
+    selftext = excluded.selftext,
+    score = excluded.score,
+    num_comments = excluded.num_comments,
+    fetched = excluded.fetched
+"""
+
+def ensure_dir(directory):
+    """ Ensure that a directory exists """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+def connect(db_path=STORY_DB):
+    """ Open the story store, creating the schema if needed """
+    ensure_dir(os.path.dirname(db_path) or ".")
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def ingest(subreddits, time_filters=("day",), limit=1000, source=None, db_path=STORY_DB, resume=True):
+    """
+    Pull top listings for every (subreddit, time filter) pair in pages of PAGE_SIZE and upsert the text
+    posts. With resume=True a week/month/year/all listing continues from the `after` cursor saved by the
+    previous run; once a pass reaches the end of a listing the cursor is cleared so the next run starts over.
+    New posts are added to the near-duplicate index, and reposts are marked used so they are never picked.
+    `source` is anything PRAW-like (source.subreddit(name).top(...)); defaults to the shared Reddit client.
+    Returns the number of posts written.
+    """
+    if source is None:
+        from fetch_story import get_reddit
+        source = get_reddit()
+
+    conn = connect(db_path)
+    index = DedupIndex()
+    written, duplicates = 0, 0
+    try:
+        for name in subreddits:
+            for time_filter in time_filters:
+                row = conn.execute("SELECT after FROM cursors WHERE subreddit = ? AND time_filter = ?",
+                                   (name, time_filter)).fetchone()
+                params = {}
+                rolling = time_filter in ROLLING_TIME_FILTERS
+                if resume and not rolling and row and row["after"]:
+                    params["after"] = row["after"]
+
+                print(f"📜 Ingesting r/{name} top/{time_filter}...")
+                batch, repeats, after, seen, failed, now = [], [], None, 0, False, time.time()
+                try:
+                    for post in source.subreddit(name).top(time_filter=time_filter, limit=limit, params=params):
+                        after = post.fullname
+                        seen += 1
+                        if post.stickied or not post.selftext:
+                            continue
+                        batch.append((post.id, name, post.title, post.selftext, post.score,
+                                      getattr(post, "num_comments", 0), post.created_utc,
+                                      getattr(post, "url", None), now))
+                        if index.check_and_add(post.id, post.title + "\n" + post.selftext):
+                            repeats.append((post.id,))
+                            duplicates += 1
+                        if len(batch) >= PAGE_SIZE:
+                            written += flush(conn, batch, repeats)
+                            batch, repeats = [], []
+                except Exception as e:
+                    print(f"⚠ Error ingesting r/{name} ({time_filter}): {e}")
+                    failed = True
+
+                written += flush(conn, batch, repeats)
+                if rolling or (seen < limit and not failed):
+                    # A short (or empty) pass means the listing is exhausted; start from the top next time
+                    conn.execute("DELETE FROM cursors WHERE subreddit = ? AND time_filter = ?",
+                                 (name, time_filter))
+                elif after:
+                    # A full pass, or an interrupted one: carry on after the last post we saw
+                    conn.execute("INSERT OR REPLACE INTO cursors (subreddit, time_filter, after, updated) "
+                                 "VALUES (?, ?, ?, ?)", (name, time_filter, after, now))
+                conn.commit()
+    finally:
+        index.close()
+        conn.close()
+
+    print(f"✅ Stored {written} posts ({duplicates} near-duplicates marked used)")
+    return written
+
+def flush(conn, batch, repeats):
+    """ Upsert a batch of posts and mark the near-duplicates among them as used """
+    conn.executemany(UPSERT, batch)
+    conn.executemany("UPDATE posts SET used = 1 WHERE id = ?", repeats)
+    conn.commit()
+    return len(batch)
+
+def pick_stories(count=1, subreddits=None, min_score=0, since=None, mark_used=True, db_path=STORY_DB):
+    """
+    Pick the highest-scoring unused stories from the local store (no API calls) and, by default, mark them
+    used so no other job picks them. Returns dicts shaped like fetch_story.get_top_stories.
+    """
+    conn = connect(db_path)
+    try:
+        query = "SELECT * FROM posts WHERE used = 0 AND score >= ?"
+        args = [min_score]
+        if subreddits:
+            query += f" AND subreddit IN ({', '.join('?' * len(subreddits))})"
+            args += list(subreddits)
+        if since is not None:
+            query += " AND created_utc >= ?"
+            args.append(since)
+        query += " ORDER BY score DESC LIMIT ?"
+        args.append(count)
+
+        conn.execute("BEGIN IMMEDIATE")  # Pick and mark atomically across processes
+        rows = conn.execute(query, args).fetchall()
+        if mark_used and rows:
+            conn.executemany("UPDATE posts SET used = 1 WHERE id = ?", [(row["id"],) for row in rows])
+        conn.commit()
+    finally:
+        conn.close()
+
+    return [{
+        "id": row["id"],
+        "subreddit": row["subreddit"],
+        "title": row["title"],
+        "score": row["score"],
+        "text": row["title"] + "\n" + row["selftext"],
+    } for row in rows]
+
+def mark_used(ids, used=True, db_path=STORY_DB):
+    """ Set or clear the used flag, e.g. to return stories from a failed job to the pool """
+    conn = connect(db_path)
+    try:
+        conn.executemany("UPDATE posts SET used = ? WHERE id = ?", [(int(used), post_id) for post_id in ids])
+        conn.commit()
+    finally:
+        conn.close()
+
+class StubPost:
+    """ Minimal stand-in for a praw Submission """
+
+    def __init__(self, id, title, selftext, score=1, created_utc=0.0, stickied=False, num_comments=0, url=None):
+        self.id = id
+        self.fullname = f"t3_{id}"
+        self.title = title
+        self.selftext = selftext
+        self.score = score
+        self.created_utc = created_utc
+        self.stickied = stickied
+        self.num_comments = num_comments
+        self.url = url
+
+class StubSource:
+    """
+    PRAW-like source backed by in-memory posts ({subreddit: [StubPost, ...]}) for offline runs.
+    Honours limit and the `after` cursor like a real listing.
+    """
+
+    def __init__(self, posts):
+        self.posts = posts
+        self.name = None
+
+    def subreddit(self, name):
+        stub = StubSource(self.posts)
+        stub.name = name
+        return stub
+
+    def top(self, time_filter="all", limit=100, params=None):
+        posts = sorted(self.posts.get(self.name, []), key=lambda post: post.score, reverse=True)
+        after = (params or {}).get("after")
+        if after:
+            names = [post.fullname for post in posts]
+            posts = posts[names.index(after) + 1:] if after in names else []
+        return iter(posts[:limit])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest top Reddit posts into the local story store")
+    parser.add_argument("subreddits", nargs="+")
+    parser.add_argument("--time-filter", nargs="+", default=["day"],
+                        choices=["hour", "day", "week", "month", "year", "all"])
+    parser.add_argument("--limit", type=int, default=1000, help="Posts per subreddit and time filter")
+    parser.add_argument("--restart", action="store_true", help="Ignore saved cursors and start from the top")
+    args = parser.parse_args()
+
+    ingest(args.subreddits, args.time_filter, limit=args.limit, resume=not args.restart)
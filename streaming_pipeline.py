@@ -0,0 +1,225 @@
+import os
+import queue
+import re
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from generate_voiceover import TTS_CACHE_DIR, TTS_WORKERS, concat_audio, synthesize_sentence
+from reformat_story import OLLAMA_MODEL, reformat_story_ollama
+from media import probe_media, scaled_width
+from render_ffmpeg import RESULTS_DIR, TITLE_STYLE, build_ass_subtitles, ensure_dir, render_threads
+from render_parallel import concat_segments, render_segment
+
+MIN_SPAN_SECONDS = 8.0  # Sentences are grouped into video segments of at least this much audio
+
+SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s+")
+
+class SentenceBuffer:
+    """ Collects streamed LLM tokens and hands out each sentence as soon as it is complete """
+
+    def __init__(self, on_sentence):
+        self.on_sentence = on_sentence
+        self.text = ""
+        self.lock = threading.Lock()
+
+    def feed(self, token):
+        with self.lock:
+            self.text += token
+            while True:
+                match = SENTENCE_END.search(self.text)
+                if not match:
+                    break
+                sentence = " ".join(self.text[:match.end()].split())
+                self.text = self.text[match.end():]
+                if sentence:
+                    self.on_sentence(sentence)
+
+    def flush(self):
+        with self.lock:
+            sentence = " ".join(self.text.split())
+            self.text = ""
+        if sentence:
+            self.on_sentence(sentence)
+
+def narrate_rewrite(story_text, model, buffer):
+    """
+    Stream the LLM rewrite of story_text into buffer. Returns (narrated text, error): if the rewrite fails
+    before any token arrives the raw story is narrated instead, as the non-streaming pipeline would use it;
+    if it fails part-way, only a fragment was narrated and error says so.
+    """
+    streamed = []
+
+    def narrate(token):
+        streamed.append(token)
+        buffer.feed(token)
+
+    try:
+        formatted_story = reformat_story_ollama(story_text, model, on_token=narrate)
+    except Exception as e:
+        print(f"⚠ Error with Ollama AI: {e}")
+        formatted_story = story_text
+
+    narrated = "".join(streamed)
+    if not narrated.strip():
+        buffer.feed(formatted_story)
+        return formatted_story.strip(), None
+    # The rewrite falls back to the original text when it fails, which is not what was already narrated
+    if narrated.split() != formatted_story.split():
+        return narrated.strip(), "the rewrite failed part-way through the story"
+    return narrated.strip(), None
+
+def span_phrases(sentences):
+    """ Subtitle phrases for (start, text, duration) sentences, timed within each sentence's real audio """
+    from create_video import split_text_with_voice_timing
+
+    phrases = []
+    for start, text, duration in sentences:
+        for offset, phrase, phrase_duration in split_text_with_voice_timing(text, duration):
+            if offset >= duration:
+                break
+            phrases.append((start + offset, phrase, min(phrase_duration, duration - offset)))
+    return phrases
+
+def create_video_streaming(story_text, background, output_file=None, title="Reddit Story", model=OLLAMA_MODEL,
+                           lang="en", engine="gtts", height=720, fps=24, min_span_seconds=MIN_SPAN_SECONDS,
+                           tts_workers=TTS_WORKERS, render_workers=None, preset="ultrafast"):
+    """
+    Rewrite, narrate and render a story as a stream: each sentence goes to TTS as soon as the LLM finishes it,
+    and each span of finished audio is rendered as its own video segment while the LLM is still generating.
+    The segments are stream-copied together at the end. Returns (output_file, formatted_story) or (None, text).
+    """
+    ensure_dir(RESULTS_DIR)
+
+    if output_file is None:
+        output_file = os.path.join(RESULTS_DIR, "final_video.mp4")
+
+    if not os.path.exists(background) or os.path.getsize(background) < 1000:
+        print("❌ Background video file is missing or too small.")
+        return None, ""
+
+    src_width, src_height, background_duration = probe_media(background)
+    if src_width == 0 or src_height == 0:
+        print("❌ Error: Video width or height is 0.")
+        return None, ""
+
+    width = scaled_width(src_width, src_height, height)
+    work_dir = os.path.splitext(output_file)[0] + "_stream"
+    ensure_dir(work_dir)
+    ensure_dir(TTS_CACHE_DIR)
+
+    print("🎬 Streaming story through LLM, TTS and render...")
+
+    sentences = queue.Queue()
+    buffer = SentenceBuffer(sentences.put)
+    result = {}
+
+    def run_llm():
+        try:
+            result["formatted_story"], result["error"] = narrate_rewrite(story_text, model, buffer)
+        finally:
+            buffer.flush()
+            sentences.put(None)
+
+    llm_thread = threading.Thread(target=run_llm, daemon=True)
+    llm_thread.start()
+
+    tts_pool = ThreadPoolExecutor(max_workers=tts_workers)
+    render_pool = ThreadPoolExecutor(max_workers=render_workers or max(render_threads() // 2, 1))  # 2 threads each
+
+    pending_audio = []  # (sentence, future) in story order
+    chunk_files = []
+    span = []  # (start, text, duration) of sentences waiting to be rendered
+    segment_futures = []
+    clock = {"time": 0.0, "frame": 0}
+
+    def submit_span(final=False):
+        if not span:
+            return
+        start = span[0][0]
+        end = span[-1][0] + span[-1][2]
+        end_frame = round(end * fps)
+        index = len(segment_futures)
+        subtitle_file = os.path.join(work_dir, f"segment_{index:04d}.ass")
+        build_ass_subtitles(title if start < TITLE_STYLE["duration"] else "", span_phrases(span),
+                            width, height, subtitle_file)
+        job = {
+            "index": index,
+            "background": background,
+            "background_duration": background_duration,
+            "subtitle_file": subtitle_file,
+            "output_file": os.path.join(work_dir, f"segment_{index:04d}.mp4"),
+            "start_frame": clock["frame"],
+            "frames": max(end_frame - clock["frame"], 1),
+            "width": width,
+            "height": height,
+            "fps": fps,
+            "gop": fps * 2,
+            "preset": preset,
+            "threads": 2,
+        }
+        clock["frame"] = job["start_frame"] + job["frames"]
+        segment_futures.append(render_pool.submit(render_segment, job))
+        print(f"🎞 Rendering segment {index} ({start:.1f}s - {end:.1f}s){' [last]' if final else ''}")
+        span.clear()
+
+    def collect_audio(block=False):
+        # Consume finished sentence audio strictly in story order
+        while pending_audio and (block or pending_audio[0][1].done()):
+            sentence, future = pending_audio.pop(0)
+            path = future.result()
+            duration = probe_media(path)[2]
+            chunk_files.append(path)
+            span.append((clock["time"], sentence, duration))
+            clock["time"] += duration
+            if clock["time"] - span[0][0] >= min_span_seconds:
+                submit_span()
+
+    try:
+        while True:
+            try:
+                sentence = sentences.get(timeout=0.1)
+            except queue.Empty:
+                collect_audio()
+                continue
+            if sentence is None:
+                break
+            pending_audio.append((sentence, tts_pool.submit(synthesize_sentence, sentence, lang, engine)))
+            collect_audio()
+
+        collect_audio(block=True)
+        submit_span(final=True)
+        segment_files = [future.result() for future in segment_futures]
+    except Exception as e:
+        print(f"❌ Error creating video: {e}")
+        return None, result.get("formatted_story", story_text)
+    finally:
+        tts_pool.shutdown(wait=False)
+        render_pool.shutdown(wait=True)
+
+    llm_thread.join()
+    formatted_story = result.get("formatted_story", story_text)
+
+    if result.get("error"):
+        print(f"❌ Error creating video: {result['error']}")
+        return None, formatted_story
+
+    if not segment_files:
+        print("❌ No narration was produced.")
+        return None, formatted_story
+
+    audio_file = os.path.join(work_dir, "voiceover.mp3")
+    try:
+        concat_audio(chunk_files, audio_file)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return None, formatted_story
+    process = concat_segments(segment_files, audio_file, output_file, work_dir)
+
+    if process.returncode == 0 and os.path.exists(output_file) and os.path.getsize(output_file) > 1000:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        print("✅ Video Created Successfully:", output_file)
+        return output_file, formatted_story
+
+    print(f"❌ Error joining segments: {process.stderr.decode(errors='ignore')[-2000:]}")
+    return None, formatted_story
@@ -0,0 +1,143 @@
+import time
+from bisect import bisect_right
+import numpy as np
+import tracing
+
+class Overlay:
+    """
+    One caption sprite placed at (x, y) between start and end, with fade-in/out times in seconds.
+    The sprite is kept as uint8, cropped to its visible pixels; the float copies blending works on only
+    exist while the overlay is on screen (SubtitleCompositor loads and unloads them).
+    """
+
+    def __init__(self, sprite, x, y, start, end, fade_in=0.0, fade_out=0.0):
+        self.start = start
+        self.end = end
+        self.fade_in = fade_in
+        self.fade_out = fade_out
+        # Caption sprites are as wide as the caption box; only the text's bounding box is ever drawn
+        rows = np.flatnonzero(sprite[..., 3].any(axis=1))
+        cols = np.flatnonzero(sprite[..., 3].any(axis=0))
+        if rows.size:
+            sprite = sprite[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+            x, y = x + cols[0], y + rows[0]
+        else:
+            sprite = sprite[:0, :0]
+        self.sprite = np.ascontiguousarray(sprite)  # A copy, so the full-size sprite isn't kept alive
+        self.x = int(x)
+        self.y = int(y)
+        self.rgb = None
+        self.alpha = None
+
+    def load(self):
+        """ Precompute the float planes so per-frame work is a single multiply-add over the bounding box """
+        if self.rgb is None:
+            self.rgb = self.sprite[..., :3].astype(np.float32)
+            self.alpha = self.sprite[..., 3:4].astype(np.float32) / 255.0
+
+    def unload(self):
+        self.rgb = None
+        self.alpha = None
+
+    def opacity(self, t):
+        """ Fade factor at time t """
+        factor = 1.0
+        if self.fade_in > 0 and t - self.start < self.fade_in:
+            factor = min(factor, (t - self.start) / self.fade_in)
+        if self.fade_out > 0 and self.end - t < self.fade_out:
+            factor = min(factor, (self.end - t) / self.fade_out)
+        return max(factor, 0.0)
+
+class SubtitleCompositor:
+    """
+    Blends caption sprites onto video frames. Overlays are kept sorted by start time and frames arrive in
+    time order, so the captions on screen are a moving window over that list: each frame only admits the
+    overlays that have just started and drops the ones that have ended, and only those in the window hold
+    float copies of their pixels. Each is alpha-blended in place over its bounding box only. Per-frame cost
+    and memory do not grow with the number of captions in the story.
+    """
+
+    def __init__(self, overlays, frame_width, frame_height):
+        self.overlays = sorted(overlays, key=lambda overlay: overlay.start)
+        self.starts = [overlay.start for overlay in self.overlays]
+        # Running maximum of end times, to find what is on screen after a seek backwards
+        self.max_ends = []
+        running = float("-inf")
+        for overlay in self.overlays:
+            running = max(running, overlay.end)
+            self.max_ends.append(running)
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.window = []  # Overlays started by self.time and not yet ended, earliest first
+        self.next = 0  # Index of the first overlay that has not started by self.time
+        self.time = float("-inf")
+
+    def seek(self, t):
+        """ Rebuild the window for an earlier time: a binary search plus a step back over the overlaps """
+        for overlay in self.window:
+            overlay.unload()
+        self.next = bisect_right(self.starts, t)
+        index = self.next - 1
+        self.window = []
+        while index >= 0 and self.max_ends[index] > t:
+            if self.overlays[index].end > t:
+                self.window.append(self.overlays[index])
+            index -= 1
+        self.window.reverse()
+
+    def active(self, t):
+        """ Overlays visible at time t, earliest first """
+        if t < self.time:
+            self.seek(t)
+        self.time = t
+
+        while self.next < len(self.overlays) and self.overlays[self.next].start <= t:
+            self.window.append(self.overlays[self.next])
+            self.next += 1
+
+        visible = []
+        for overlay in self.window:
+            if overlay.end > t:
+                visible.append(overlay)
+            else:
+                overlay.unload()
+        self.window = visible
+        return list(visible)
+
+    def blend(self, frame, overlay, t):
+        """ Alpha-blend one overlay into frame in place, clipped to the frame """
+        opacity = overlay.opacity(t)
+        if opacity <= 0:
+            return
+
+        height, width = overlay.sprite.shape[:2]
+        x0, y0 = max(overlay.x, 0), max(overlay.y, 0)
+        x1, y1 = min(overlay.x + width, self.frame_width), min(overlay.y + height, self.frame_height)
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        overlay.load()
+        sx, sy = x0 - overlay.x, y0 - overlay.y
+        alpha = overlay.alpha[sy:sy + y1 - y0, sx:sx + x1 - x0]
+        if opacity < 1:
+            alpha = alpha * opacity
+        region = frame[y0:y1, x0:x1].astype(np.float32)
+        region += (overlay.rgb[sy:sy + y1 - y0, sx:sx + x1 - x0] - region) * alpha
+        frame[y0:y1, x0:x1] = region.astype(np.uint8)
+
+    def composite(self, frame, t):
+        """ Return frame with every caption active at t drawn on top """
+        overlays = self.active(t)
+        if not overlays:
+            return frame
+
+        started = time.perf_counter()
+        frame = np.array(frame, copy=True)
+        for overlay in overlays:
+            self.blend(frame, overlay, t)
+        tracing.tally("composite", time.perf_counter() - started)  # Per frame is too fine for a span each
+        return frame
+
+    def apply(self, clip):
+        """ Attach the compositor to a moviepy clip """
+        return clip.fl(lambda get_frame, t: self.composite(get_frame(t), t))
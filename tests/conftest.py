@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+# The modules live flat at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """ Run inside an empty directory so the relative cache/ and results/ paths stay out of the checkout """
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+import types
+
+import pytest
+
+import background_cache
+
+def fake_transcode(calls):
+    def run(command, stdout=None, stderr=None, **kwargs):
+        calls.append(command)
+        with open(command[-1], "wb") as f:
+            f.write(b"\0" * 4000)
+        return subprocess.CompletedProcess(command, 0, b"", b"")
+    return run
+
+def write_clip(name, data):
+    with open(name, "wb") as f:
+        f.write(data)
+    return name
+
+def test_normalized_clips_are_reused_and_bounded(workdir, monkeypatch):
+    calls = []
+    monkeypatch.setattr(background_cache.tracing, "run", fake_transcode(calls))
+    cache_dir = str(workdir / "normalized")
+    first_clip = write_clip("a.mp4", b"a" * 2000)
+    second_clip = write_clip("b.mp4", b"b" * 2000)
+
+    first = background_cache.normalize_background(first_clip, cache_dir=cache_dir, max_bytes=5000)
+    assert background_cache.normalize_background(first_clip, cache_dir=cache_dir, max_bytes=5000) == first
+    assert len(calls) == 1
+
+    # The budget holds one normalized clip, so the least recently used one goes
+    second = background_cache.normalize_background(second_clip, cache_dir=cache_dir, max_bytes=5000)
+    assert second != first and len(calls) == 2
+    assert not os.path.exists(first)
+
+    # Touching or rewriting a source gives it a new key, so a stale normalized copy is never served
+    before = background_cache.normalized_key(second_clip)
+    os.utime(second_clip, ns=(0, 0))
+    assert background_cache.normalized_key(second_clip) != before
+
+def test_prefetched_library_clips_are_reused(workdir, monkeypatch):
+    pytest.importorskip("requests")
+    # secrets_.py holds the API keys and is not checked in
+    monkeypatch.setitem(sys.modules, "secrets_", sys.modules.get("secrets_") or types.ModuleType("secrets_"))
+    sys.modules["secrets_"].__dict__.setdefault("PEXELS_API_KEY", "")
+    import video_library
+    from download import file_sha256
+
+    calls = []
+    monkeypatch.setattr(background_cache.tracing, "run", fake_transcode(calls))
+    db_path = str(workdir / "library.db")
+    clip = write_clip("clip.mp4", b"c" * 2000)
+
+    # What prefetch(normalize=True) does for each downloaded clip
+    conn = video_library.connect(db_path)
+    conn.execute("INSERT INTO clips (pexels_id, file_id, path, query, width, height, fps, duration, codec, size, "
+                 "sha256, added) VALUES (1, 1, ?, 'q', 1280, 720, 24, 60, 'h264', 2000, ?, 0)",
+                 (clip, file_sha256(clip)))
+    conn.commit()
+    conn.close()
+    prefilled = background_cache.normalize_background(clip, height=720, source_hash=file_sha256(clip))
+
+    # What the pipeline's background and resize stages do
+    path, sha256 = video_library.select_clip(30, 720, "q", db_path=db_path)
+    assert path == clip
+    assert background_cache.normalize_background(path, height=720, source_hash=sha256) == prefilled
+    assert len(calls) == 1
@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+import caption_cache
+
+def test_font_file_is_part_of_the_key(workdir):
+    font = workdir / "Caption.ttf"
+    font.write_bytes(b"not really a font")
+    before = caption_cache.sprite_key("Hello", {"font": str(font), "fontsize": 50})
+    assert caption_cache.sprite_key("Hello", {"font": str(font), "fontsize": 50}) == before
+
+    os.utime(font, ns=(0, 0))
+    assert caption_cache.sprite_key("Hello", {"font": str(font), "fontsize": 50}) != before
+
+def test_sprite_store_is_bounded(workdir, monkeypatch):
+    monkeypatch.setattr(caption_cache, "PRUNE_EVERY", 1)
+    monkeypatch.setattr(caption_cache, "MEMORY_ENTRIES", 0)
+    cache_dir = str(workdir / "captions")
+
+    caption_cache.get_sprite("first", cache_dir=cache_dir, fontsize=20)
+    first_size = caption_cache.prune(cache_dir, max_bytes=10 ** 9)
+    os.utime(next(os.path.join(root, name) for root, _, files in os.walk(cache_dir) for name in files), (0, 0))
+    caption_cache.get_sprite("second", cache_dir=cache_dir, max_bytes=first_size + 100, fontsize=20)
+
+    assert caption_cache.prune(cache_dir, max_bytes=10 ** 9) <= first_size + 100
+    sprite = caption_cache.get_sprite("second", cache_dir=cache_dir, fontsize=20)
+    assert sprite.ndim == 3 and sprite.shape[2] == 4
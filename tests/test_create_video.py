@@ -0,0 +1,33 @@
+import sys
+import types
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("moviepy")
+
+import create_video
+import render_hls
+
+def test_hls_engine_forwards_on_segment(workdir, monkeypatch):
+    calls = []
+    monkeypatch.setattr(render_hls, "create_video_hls", lambda *args, **kwargs: calls.append((args, kwargs)))
+    segments = []
+
+    create_video.create_video("bg.mp4", "voice.wav", "out.mp4", engine="hls", on_segment=segments.append)
+
+    (args, kwargs), = calls
+    assert args[2] == "out_hls" and kwargs["on_segment"] == segments.append
+
+def test_pipeline_rejects_the_hls_engine(monkeypatch):
+    pytest.importorskip("praw")
+    # secrets_.py holds the API keys and is not checked in
+    secrets = types.ModuleType("secrets_")
+    secrets.REDDIT_CLIENT_ID = secrets.REDDIT_CLIENT_SECRET = secrets.REDDIT_USER_AGENT = ""
+    secrets.PEXELS_API_KEY = ""
+    monkeypatch.setitem(sys.modules, "secrets_", sys.modules.get("secrets_", secrets))
+    import master_script
+
+    with pytest.raises(ValueError, match="hls"):
+        master_script.pipeline_stages(engine="hls")
+    assert master_script.pipeline_stages(engine="ffmpeg")
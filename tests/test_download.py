@@ -0,0 +1,128 @@
+import http.server
+import os
+import threading
+
+import pytest
+
+pytest.importorskip("requests")
+
+import download
+
+BODY = bytes(range(256)) * 4096  # 1 MB
+
+class StubServer(http.server.ThreadingHTTPServer):
+    """ Serves BODY with an ETag and Range support; `script` lists what to do for each request in turn """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.script = []
+        self.requests = []
+        self.body = BODY
+        self.etag = '"v1"'
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/clip.mp4"
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        action = server.script.pop(0) if server.script else "ok"
+
+        if action in ("503", "429"):
+            self.send_response(int(action))
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body, start = server.body, 0
+        range_header = self.headers.get("Range")
+        if range_header and self.headers.get("If-Range") in (None, server.etag):
+            start = int(range_header.split("=")[1].rstrip("-"))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", server.etag)
+        self.send_header("Content-Length", str(len(body) - start))
+        self.end_headers()
+
+        if action == "drop":
+            # Send half of what was promised, then hang up
+            self.wfile.write(body[start:start + (len(body) - start) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+        self.wfile.write(body[start:])
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(download.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(download, "_session", None)  # A fresh pool per server
+    stub = StubServer()
+    thread = threading.Thread(target=stub.serve_forever, daemon=True)
+    thread.start()
+    yield stub
+    stub.shutdown()
+    stub.server_close()
+
+def test_dropped_download_resumes_with_range(server, workdir):
+    server.script = ["drop"]
+    path = str(workdir / "clip.mp4")
+    assert download.download_file(server.url, path, chunk_size=65536) == path
+
+    with open(path, "rb") as f:
+        assert f.read() == BODY
+    assert len(server.requests) == 2
+    assert server.requests[1]["Range"] == f"bytes={len(BODY) // 2}-"
+    assert server.requests[1]["If-Range"] == '"v1"'
+    assert not os.path.exists(path + ".part") and not os.path.exists(path + ".part.json")
+
+def test_server_errors_are_retried(server, workdir):
+    server.script = ["503", "429"]
+    path = str(workdir / "clip.mp4")
+    download.download_file(server.url, path)
+    assert len(server.requests) == 3
+    with open(path, "rb") as f:
+        assert f.read() == BODY
+
+def test_gives_up_after_retries(server, workdir):
+    server.script = ["503"] * 3
+    with pytest.raises(download.RetryableStatus):
+        download.download_file(server.url, str(workdir / "clip.mp4"), retries=2)
+
+def test_part_file_from_an_old_version_is_not_resumed(server, workdir):
+    path = str(workdir / "clip.mp4")
+    server.script = ["drop"]
+    with pytest.raises(Exception):
+        download.download_file(server.url, path, retries=0, chunk_size=65536)
+    assert os.path.getsize(path + ".part") == len(BODY) // 2
+
+    # The file changed on the server: If-Range no longer matches, so it comes back whole
+    server.body, server.etag = BODY[::-1], '"v2"'
+    download.download_file(server.url, path)
+    with open(path, "rb") as f:
+        assert f.read() == BODY[::-1]
+
+def test_part_file_from_another_url_is_discarded(server, workdir):
+    path = str(workdir / "clip.mp4")
+    with open(path + ".part", "wb") as f:
+        f.write(b"someone else's bytes")
+    download.download_file(server.url, path)
+    assert "Range" not in server.requests[0]
+    with open(path, "rb") as f:
+        assert f.read() == BODY
+
+def test_size_mismatch_is_rejected(server, workdir):
+    path = str(workdir / "clip.mp4")
+    with pytest.raises(IOError):
+        download.download_file(server.url, path, expected_size=len(BODY) + 1)
+    assert os.listdir(workdir) == []
@@ -0,0 +1,83 @@
+import os
+import shutil
+import subprocess
+import types
+
+import pytest
+
+import generate_voiceover
+
+@pytest.fixture
+def fake_engine(monkeypatch):
+    """ A TTS engine that writes the sentence itself as the 'audio' and records what it was asked for """
+    calls = []
+
+    def synthesize(text, output_file, lang="en"):
+        calls.append(text)
+        with open(output_file, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    monkeypatch.setitem(generate_voiceover.TTS_ENGINES, "fake", synthesize)
+    return calls
+
+def test_sentences_are_cached_individually(workdir, fake_engine):
+    cache_dir = str(workdir / "tts")
+    os.makedirs(cache_dir)
+    first = [generate_voiceover.synthesize_sentence(s, engine="fake", cache_dir=cache_dir)
+             for s in generate_voiceover.split_sentences("One fish. Two fish! Red fish?")]
+    assert fake_engine == ["One fish.", "Two fish!", "Red fish?"]
+
+    # Editing one sentence re-synthesizes only that one
+    fake_engine.clear()
+    second = [generate_voiceover.synthesize_sentence(s, engine="fake", cache_dir=cache_dir)
+              for s in generate_voiceover.split_sentences("One fish. Blue fish! Red fish?")]
+    assert fake_engine == ["Blue fish!"]
+    assert second[0] == first[0] and second[2] == first[2] and second[1] != first[1]
+
+def test_failed_synthesis_leaves_no_temp_files(workdir, monkeypatch):
+    def broken(text, output_file, lang="en"):
+        with open(output_file, "w") as f:
+            f.write("partial")
+        raise ConnectionError("TTS service unreachable")
+
+    monkeypatch.setitem(generate_voiceover.TTS_ENGINES, "broken", broken)
+    cache_dir = str(workdir / "tts")
+    os.makedirs(cache_dir)
+    with pytest.raises(ConnectionError):
+        generate_voiceover.synthesize_sentence("Hello.", engine="broken", cache_dir=cache_dir)
+    assert os.listdir(cache_dir) == []
+
+def test_empty_text_is_an_error(workdir, fake_engine):
+    with pytest.raises(ValueError):
+        generate_voiceover.generate_voiceover("  \n ", str(workdir / "voiceover.mp3"), engine="fake",
+                                              cache_dir=str(workdir / "tts"))
+    assert fake_engine == []
+
+def test_failed_concat_raises_and_cleans_up(workdir, monkeypatch):
+    output_file = str(workdir / "voiceover.mp3")
+
+    def failing_run(command, **kwargs):
+        with open(output_file, "wb") as f:
+            f.write(b"partial")
+        return types.SimpleNamespace(returncode=1, stderr=b"Invalid data found when processing input")
+
+    monkeypatch.setattr(generate_voiceover.subprocess, "run", failing_run)
+    with pytest.raises(RuntimeError, match="Invalid data"):
+        generate_voiceover.concat_audio(["a.mp3", "b.mp3"], output_file)
+    assert os.listdir(workdir) == []
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+def test_generate_voiceover_joins_chunks(workdir, monkeypatch):
+    def tone(text, output_file, lang="en"):
+        # One second of silence per sentence, as real mp3
+        subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", "anullsrc=r=24000:cl=mono",
+                        "-t", "1", "-c:a", "libmp3lame", output_file], check=True)
+
+    monkeypatch.setitem(generate_voiceover.TTS_ENGINES, "tone", tone)
+    output_file = str(workdir / "voiceover.mp3")
+    timings = generate_voiceover.generate_voiceover("First. Second. Third.", output_file, engine="tone",
+                                                    cache_dir=str(workdir / "tts"))
+    assert [t["text"] for t in timings] == ["First.", "Second.", "Third."]
+    assert timings[2]["start"] == pytest.approx(2.0, abs=0.1)
+    assert generate_voiceover.probe_media(output_file)[2] == pytest.approx(3.0, abs=0.2)
+    assert not os.path.exists(output_file + ".txt")
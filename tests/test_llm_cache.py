@@ -0,0 +1,14 @@
+import llm_cache
+
+def test_round_trip_and_empty_responses_are_not_cached(workdir):
+    db_path = str(workdir / "llm.db")
+    assert llm_cache.get("ollama", "mistral", "T {story}", "T hi", db_path=db_path) is None
+
+    llm_cache.put("ollama", "mistral", "T {story}", "T hi", "  \n", db_path=db_path)
+    assert llm_cache.get("ollama", "mistral", "T {story}", "T hi", db_path=db_path) is None
+    assert llm_cache.stats(db_path)["entries"] == 0
+
+    llm_cache.put("ollama", "mistral", "T {story}", "T hi", "Rewritten.", db_path=db_path)
+    assert llm_cache.get("ollama", "mistral", "T {story}", "T hi", db_path=db_path) == "Rewritten."
+    # A different template version is a different entry
+    assert llm_cache.get("ollama", "mistral", "U {story}", "T hi", db_path=db_path) is None
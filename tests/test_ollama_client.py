@@ -0,0 +1,83 @@
+import functools
+import http.server
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("requests")
+
+import ollama_client
+import reformat_story
+
+class StubOllama(http.server.ThreadingHTTPServer):
+    """ Streams /api/generate replies as JSON lines: the last line of the prompt upper-cased, word by word """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.payloads = []
+        self.error = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.payloads.append(payload)
+        words = payload["prompt"].strip().split("\n")[-1].upper().split()
+        lines = [{"response": word if i == 0 else " " + word, "done": False} for i, word in enumerate(words)]
+        if self.server.error:
+            lines.append({"error": self.server.error})
+        lines.append({"response": "", "done": True})
+        body = b"".join(json.dumps(line).encode() + b"\n" for line in lines)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+@pytest.fixture
+def ollama():
+    server = StubOllama()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_generate_streams_tokens(ollama):
+    tokens = []
+    response = ollama_client.generate("Rewrite:\nthe cat sat", "mistral", on_token=tokens.append, host=ollama.url)
+
+    assert response == "THE CAT SAT"
+    assert tokens == ["THE", " CAT", " SAT"]
+    payload = ollama.payloads[0]
+    assert payload["stream"] is True and payload["model"] == "mistral"
+    assert payload["keep_alive"] == ollama_client.KEEP_ALIVE
+
+    ollama.error = "model not found"
+    with pytest.raises(RuntimeError, match="model not found"):
+        ollama_client.generate("Rewrite:\nthe cat sat", "mistral", host=ollama.url)
+
+def test_chunked_rewrite_streams_the_first_chunk(ollama, workdir, monkeypatch):
+    monkeypatch.setattr(reformat_story, "generate", functools.partial(ollama_client.generate, host=ollama.url))
+    story = "A title\n\nfirst part of the story here.\n\nsecond part follows now.\n\nthird and last part."
+
+    tokens = []
+    result = reformat_story.reformat_story_chunked(story, max_words=5, on_token=tokens.append)
+
+    parts = result.split("\n\n")
+    assert len(parts) == 4
+    assert all(part.isupper() for part in parts)
+    # The first chunk arrives token by token, later ones whole and in order
+    first_part_tokens = tokens[:tokens.index("\n\n")]
+    assert len(first_part_tokens) > 1 and "".join(first_part_tokens) == parts[0]
+    assert "".join(tokens) == result + "\n\n"
@@ -0,0 +1,128 @@
+import os
+import types
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("moviepy")  # create_video, which lays out the captions, imports it at module level
+
+import render_incremental
+from audio_analysis import SAMPLE_RATE
+
+SENTENCES = [
+    "My sister borrowed my car for the whole weekend.",
+    "She said she needed it for a job interview.",
+    "On Monday I found the paint on the door was blue and scratched.",
+    "She told me it was already like that.",
+    "I showed her the photos I took before she left.",
+    "Now my parents say I am being petty about it.",
+    "So am I wrong for asking her to pay?",
+]
+
+def timing_map(sentences, pause=0.4, seconds_per_char=0.07):
+    """ What analyze_voiceover reports for one speech span per sentence, separated by pauses """
+    speech, clock = [], 0.0
+    for sentence in sentences:
+        length = len(sentence.replace(" ", "")) * seconds_per_char
+        speech.append([round(clock, 3), round(clock + length, 3)])
+        clock += length + pause
+    duration = round(clock - pause + 0.3, 3)
+    return {"duration": duration, "source_duration": duration, "speech": speech, "kept": [[0.0, duration, 0.0]]}
+
+@pytest.fixture
+def fake_ffmpeg(workdir, monkeypatch):
+    """ Stand in for the ffmpeg calls; everything else (captions, segmenting, keys, manifest) runs for real """
+    rendered = []
+    durations = {}
+
+    def probe_media(path):
+        return (1280, 720, 30.0) if path.endswith("background.mp4") else (0, 0, durations[path])
+
+    def render_segment(job):
+        rendered.append(job)
+        with open(job["output_file"], "wb") as f:
+            f.write(b"\0" * 2000)
+        return job["output_file"]
+
+    def concat_segments(segment_files, audio, output_file, work_dir):
+        assert all(os.path.exists(path) for path in segment_files)
+        with open(output_file, "wb") as f:
+            f.write(b"\0" * 2000)
+        return types.SimpleNamespace(returncode=0, stderr=b"")
+
+    def decode_pcm(audio_file, pcm_file=None, sample_rate=SAMPLE_RATE):
+        return np.zeros(int(durations[audio_file] * sample_rate), dtype=np.int16)
+
+    monkeypatch.setattr(render_incremental, "probe_media", probe_media)
+    monkeypatch.setattr(render_incremental, "render_segment", render_segment)
+    monkeypatch.setattr(render_incremental, "concat_segments", concat_segments)
+    monkeypatch.setattr(render_incremental, "decode_pcm", decode_pcm)
+    with open("background.mp4", "wb") as f:
+        f.write(b"\0" * 2000)
+    return rendered, durations
+
+def render(sentences, fake_ffmpeg, work_dir="segments"):
+    rendered, durations = fake_ffmpeg
+    rendered.clear()
+    durations["voiceover.mp3"] = timing_map(sentences)["duration"]
+    output = render_incremental.create_video_incremental(
+        "background.mp4", "voiceover.mp3", "final_video.mp4", title="AITA", story_text=" ".join(sentences),
+        timing_map=timing_map(sentences), work_dir=work_dir)
+    assert output == "final_video.mp4"
+    return [job["index"] for job in rendered], render_incremental.load_manifest(work_dir)["segments"]
+
+def test_one_word_edit_reencodes_only_its_segment(fake_ffmpeg):
+    first, segments = render(SENTENCES, fake_ffmpeg)
+    assert first == list(range(len(segments))) and len(segments) >= 3
+
+    edited = list(SENTENCES)
+    edited[2] = edited[2].replace("blue", "turquoise")
+    changed, edited_segments = render(edited, fake_ffmpeg)
+
+    # Everything after the edit moved later in the video, but only the edited sentence's segment is new
+    edited_index = next(entry["index"] for entry in edited_segments
+                        if any("turquoise" in phrase[1] for phrase in entry["phrases"]))
+    assert changed == [edited_index]
+    assert edited_segments[-1]["start_frame"] > segments[-1]["start_frame"]
+    assert [entry["key"] for entry in edited_segments if entry["index"] != edited_index] == \
+           [entry["key"] for entry in segments if entry["index"] != edited_index]
+
+    # Segments of the first render that the edit replaced are gone; the work dir holds one render
+    files = {name for name in os.listdir("segments") if name.endswith(".mp4")}
+    assert files == {entry["file"] for entry in edited_segments}
+
+def test_unchanged_render_reencodes_nothing(fake_ffmpeg):
+    render(SENTENCES, fake_ffmpeg)
+    again, _ = render(SENTENCES, fake_ffmpeg)
+    assert again == []
+
+def test_voiceover_is_recut_to_whole_segment_frames(fake_ffmpeg):
+    _, segments = render(SENTENCES, fake_ffmpeg)
+    import wave
+    with wave.open(os.path.join("segments", render_incremental.AUDIO_NAME), "rb") as wav:
+        samples = wav.getnframes()
+    frames = sum(entry["frames"] for entry in segments)
+    assert samples == round(frames * SAMPLE_RATE / 24)
+
+def test_segments_start_on_sentences():
+    phrases = [(0.0, "One two three.", 3.0), (3.5, "Four five", 3.0), (7.0, "six.", 1.0), (8.5, "Seven.", 2.0)]
+    segments = render_incremental.sentence_segments(phrases, 10.5, 24, segment_seconds=6)
+    assert [(start, end) for start, end, _ in segments] == [(0.0, 8.5), (8.5, 10.5)]
+    assert [frames for _, _, frames in segments] == [204, 48]
+
+def test_phrase_cut_by_a_segment_boundary_does_not_fade_there(workdir):
+    from render_ffmpeg import build_ass_subtitles
+
+    phrases = [(1.0, "Before.", 2.0), (5.0, "Across the cut", 2.0)]
+    first = render_incremental.relative_phrases(phrases, 0.0, 6.0)
+    second = render_incremental.relative_phrases(phrases, 6.0, 12.0)
+    build_ass_subtitles("", first, 1280, 720, "first.ass")
+    build_ass_subtitles("", second, 1280, 720, "second.ass")
+
+    with open("first.ass", encoding="utf-8") as f:
+        first_lines = [line for line in f if line.startswith("Dialogue")]
+    with open("second.ass", encoding="utf-8") as f:
+        second_lines = [line for line in f if line.startswith("Dialogue")]
+    assert "\\fad(500,500)}Before." in first_lines[0]
+    assert "\\fad(500,0)}Across the cut" in first_lines[1]
+    assert "\\fad(0,500)}Across the cut" in second_lines[0]
@@ -0,0 +1,25 @@
+import os
+import time
+
+import stage_cache
+
+def test_download_path_is_stable_and_abandoned_parts_are_swept(workdir):
+    cache_dir = str(workdir / "stages")
+    key = stage_cache.stage_key("background", query="q")
+    path = stage_cache.download_path(key, ".mp4", cache_dir)
+    assert path == stage_cache.download_path(key, ".mp4", cache_dir)  # Same for the next run's process
+
+    # One download crashed long ago, one is still in progress
+    old = stage_cache.download_path("background-old", ".mp4", cache_dir)
+    for leftover in (old + ".part", old + ".part.json", path + ".part"):
+        with open(leftover, "wb") as f:
+            f.write(b"x" * 10)
+    day_ago = time.time() - stage_cache.STALE_PART_SECONDS - 60
+    os.utime(old + ".part", (day_ago, day_ago))
+    os.utime(old + ".part.json", (day_ago, day_ago))
+
+    stage_cache.write_text("story-abc", "text", cache_dir=cache_dir)
+
+    assert not os.path.exists(old + ".part") and not os.path.exists(old + ".part.json")
+    assert os.path.exists(path + ".part")
+    assert stage_cache.read_text("story-abc", cache_dir=cache_dir) == "text"
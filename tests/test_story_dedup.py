@@ -0,0 +1,47 @@
+import sys
+import types
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import story_store
+from story_dedup import find_duplicate
+from story_store import StubPost, StubSource
+
+def story_text(i):
+    return " ".join(f"word{i}_{j}" for j in range(40))
+
+def test_ingested_story_does_not_match_itself(workdir):
+    source = StubSource({"tifu": [StubPost("abc", "Title", story_text(1))]})
+    story_store.ingest(["tifu"], ("day",), limit=10, source=source, db_path=str(workdir / "stories.db"))
+
+    assert find_duplicate("Title\n" + story_text(1), "abc") is None
+    assert find_duplicate("Title\n" + story_text(1), "xyz")[0] == "abc"
+
+def fake_run_job(job):
+    ok = job["id"] != "broken"
+    return {"id": job["id"], "subreddit": job["subreddit"], "title": job["title"], "job_dir": job["job_dir"],
+            "final_video": "video.mp4" if ok else None, "ok": ok, "error": None if ok else "render failed",
+            "seconds": 0.0}
+
+def test_batch_only_remembers_rendered_stories(workdir, monkeypatch):
+    pytest.importorskip("praw")
+    # secrets_.py holds the API keys and is not checked in
+    secrets = types.ModuleType("secrets_")
+    secrets.REDDIT_CLIENT_ID = secrets.REDDIT_CLIENT_SECRET = secrets.REDDIT_USER_AGENT = ""
+    monkeypatch.setitem(sys.modules, "secrets_", sys.modules.get("secrets_", secrets))
+    import batch_videos
+
+    stories = [{"id": story_id, "subreddit": "tifu", "title": "T", "score": 1, "text": story_text(i)}
+               for i, story_id in enumerate(["good", "broken"])]
+    stories.append(dict(stories[0], id="repost"))
+    monkeypatch.setattr(batch_videos, "get_top_stories", lambda *args, **kwargs: stories)
+    monkeypatch.setattr(batch_videos, "run_job", fake_run_job)
+
+    results = batch_videos.run_batch(["tifu"], count=3, workers=1, batch_dir=str(workdir / "batch"))
+
+    # The in-batch repost was skipped, the failed story stays available for a later run
+    assert sorted(result["id"] for result in results) == ["broken", "good"]
+    assert find_duplicate(story_text(0), "repost")[0] == "good"
+    assert find_duplicate(story_text(1), "retry") is None
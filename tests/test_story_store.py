@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip("numpy")  # The near-duplicate index hashes with numpy
+
+import story_store
+from story_store import StubPost, StubSource
+
+def make_posts(count, prefix="p"):
+    # Distinct wording per post so the near-duplicate index keeps them all
+    return [StubPost(f"{prefix}{i}", f"Title {i}", " ".join(f"word{i}_{j}" for j in range(40)), score=1000 - i)
+            for i in range(count)]
+
+def cursor(db_path, name, time_filter):
+    conn = story_store.connect(db_path)
+    try:
+        row = conn.execute("SELECT after FROM cursors WHERE subreddit = ? AND time_filter = ?",
+                           (name, time_filter)).fetchone()
+        return row["after"] if row else None
+    finally:
+        conn.close()
+
+def test_two_pass_ingest_resumes_then_clears_cursor(workdir):
+    db_path = str(workdir / "stories.db")
+    source = StubSource({"tifu": make_posts(25)})
+
+    assert story_store.ingest(["tifu"], ("week",), limit=10, source=source, db_path=db_path) == 10
+    assert cursor(db_path, "tifu", "week") == "t3_p9"
+
+    assert story_store.ingest(["tifu"], ("week",), limit=10, source=source, db_path=db_path) == 10
+    assert cursor(db_path, "tifu", "week") == "t3_p19"
+
+    # Only 5 posts left: the listing is exhausted, so the next pass starts from the top again
+    assert story_store.ingest(["tifu"], ("week",), limit=10, source=source, db_path=db_path) == 5
+    assert cursor(db_path, "tifu", "week") is None
+
+    picked = story_store.pick_stories(100, db_path=db_path, mark_used=False)
+    assert len(picked) == 25
+
+def test_rolling_listing_keeps_no_cursor(workdir):
+    db_path = str(workdir / "stories.db")
+    source = StubSource({"tifu": make_posts(25)})
+
+    story_store.ingest(["tifu"], ("day",), limit=10, source=source, db_path=db_path)
+    assert cursor(db_path, "tifu", "day") is None
+
+    # New posts at the top of a rolling listing are picked up on the next run
+    source.posts["tifu"].append(StubPost("new", "New", " ".join(f"fresh{j}" for j in range(40)), score=5000))
+    story_store.ingest(["tifu"], ("day",), limit=10, source=source, db_path=db_path)
+    ids = {story["id"] for story in story_store.pick_stories(100, db_path=db_path, mark_used=False)}
+    assert "new" in ids
+
+def test_released_stories_can_be_picked_again(workdir):
+    db_path = str(workdir / "stories.db")
+    story_store.ingest(["tifu"], ("week",), limit=10, source=StubSource({"tifu": make_posts(3)}), db_path=db_path)
+
+    first = story_store.pick_stories(2, db_path=db_path)
+    assert [story["id"] for story in first] == ["p0", "p1"]
+    assert [story["id"] for story in story_store.pick_stories(2, db_path=db_path)] == ["p2"]
+
+    story_store.mark_used(["p1"], used=False, db_path=db_path)
+    assert [story["id"] for story in story_store.pick_stories(2, db_path=db_path)] == ["p1"]
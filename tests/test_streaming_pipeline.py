@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("tqdm")
+
+import streaming_pipeline
+from streaming_pipeline import SentenceBuffer, narrate_rewrite
+
+STORY = "I lent my car to my sister. She returned it scratched."
+
+def narrate(monkeypatch, fake_rewrite):
+    monkeypatch.setattr(streaming_pipeline, "reformat_story_ollama", fake_rewrite)
+    sentences = []
+    buffer = SentenceBuffer(sentences.append)
+    narrated, error = narrate_rewrite(STORY, "mistral", buffer)
+    buffer.flush()
+    return narrated, error, sentences
+
+def test_failure_before_any_token_narrates_the_raw_story(monkeypatch):
+    def fail(story_text, model, on_token=None):
+        raise ConnectionError("Ollama is not running")
+
+    narrated, error, sentences = narrate(monkeypatch, fail)
+    assert error is None and narrated == STORY
+    assert sentences == ["I lent my car to my sister.", "She returned it scratched."]
+
+def test_failure_mid_stream_is_reported_with_what_was_narrated(monkeypatch):
+    def fail_part_way(story_text, model, on_token=None):
+        on_token("My sister borrowed my car. ")
+        on_token("She brought it")
+        return story_text  # What reformat_story_ollama falls back to when the stream breaks
+
+    narrated, error, sentences = narrate(monkeypatch, fail_part_way)
+    assert error and narrated == "My sister borrowed my car. She brought it"
+    assert " ".join(sentences) == narrated
+
+def test_streamed_rewrite_is_returned_as_narrated(monkeypatch):
+    def rewrite(story_text, model, on_token=None):
+        for token in ["My sister ", "borrowed my car.", " It came back blue."]:
+            on_token(token)
+        return "My sister borrowed my car. It came back blue."
+
+    narrated, error, sentences = narrate(monkeypatch, rewrite)
+    assert error is None and narrated == "My sister borrowed my car. It came back blue."
+    assert sentences == ["My sister borrowed my car.", "It came back blue."]
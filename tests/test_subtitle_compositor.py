@@ -0,0 +1,39 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from subtitle_compositor import Overlay, SubtitleCompositor
+
+def box_sprite(width=400, height=60, text_box=(100, 10, 140, 30)):
+    """ A box-width sprite, transparent except an opaque white rectangle (x0, y0, x1, y1) """
+    sprite = np.zeros((height, width, 4), dtype=np.uint8)
+    x0, y0, x1, y1 = text_box
+    sprite[y0:y1, x0:x1] = 255
+    return sprite
+
+def test_sprites_are_cropped_and_blended_in_place():
+    overlay = Overlay(box_sprite(), 20, 100, 0.0, 1.0)
+    assert overlay.sprite.shape == (20, 40, 4) and (overlay.x, overlay.y) == (120, 110)
+    assert overlay.rgb is None  # No float copy until it is on screen
+
+    compositor = SubtitleCompositor([overlay], 640, 360)
+    frame = compositor.composite(np.zeros((360, 640, 3), dtype=np.uint8), 0.5)
+    assert frame[110:130, 120:160].min() == 255
+    assert frame.sum() == 255 * 3 * 20 * 40
+
+def test_window_tracks_the_overlays_on_screen():
+    overlays = [Overlay(box_sprite(), 0, 0, i * 1.0, i * 1.0 + 1.5) for i in range(300)]
+    title = Overlay(box_sprite(), 0, 0, 0.0, 4.0)
+    compositor = SubtitleCompositor(overlays + [title], 640, 360)
+
+    for frame in range(0, 3000):
+        t = frame / 10
+        active = compositor.active(t)
+        assert active == [o for o in compositor.overlays if o.start <= t < o.end]
+        for overlay in active:
+            compositor.blend(np.zeros((360, 640, 3), dtype=np.uint8), overlay, t)
+        # Only what is on screen holds float pixels
+        assert sum(o.rgb is not None for o in compositor.overlays) <= len(active)
+
+    # Seeking back (moviepy reads the first frame again at the end) finds the same overlays
+    assert compositor.active(0.5) == [o for o in compositor.overlays if o.start <= 0.5 < o.end]
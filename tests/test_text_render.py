@@ -0,0 +1,20 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+from text_render import render_text
+
+def test_long_label_fits_its_box():
+    title = "AITA for telling my sister that her wedding plans were unreasonable after she asked all of us " * 2
+    sprite = render_text(title, fontsize=70, stroke_color="black", stroke_width=4, method="label", size=(1080, None))
+
+    assert sprite.shape[1] == 1080
+    alpha = sprite[:, :, 3]
+    # Centred text that overflowed the box would be cut off at both edges
+    assert not alpha[:, 0].any() and not alpha[:, -1].any()
+    assert alpha.any()
+
+def test_short_label_keeps_its_size():
+    sprite = render_text("Short title", fontsize=70, method="label", size=(1080, None))
+    assert sprite.shape[0] == render_text("Short title", fontsize=70, method="label").shape[0]
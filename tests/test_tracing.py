@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import tracing
+
+BUSY = [sys.executable, "-c", "import time\nend = time.process_time() + 0.3\nwhile time.process_time() < end: pass"]
+
+def test_child_cpu_is_charged_to_the_spans_that_ran_it():
+    tracing.reset()
+    with tracing.span("stage.render"):
+        with tracing.span("encode"):
+            process = tracing.run(BUSY, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        with tracing.span("idle"):
+            time.sleep(0.05)
+    assert process.returncode == 0 and process.stdout == b""
+
+    spans = tracing.summary()["spans"]
+    assert spans["encode"]["children"] == 1 and spans["encode"]["child_cpu_s"] >= 0.25
+    assert spans["encode"]["child_peak_rss_mb"] > 0
+    assert spans["stage.render"]["child_cpu_s"] == spans["encode"]["child_cpu_s"]
+    assert spans["idle"]["children"] == 0 and spans["idle"]["child_cpu_s"] == 0
+
+def test_concurrent_children_are_not_counted_twice():
+    tracing.reset()
+
+    def encode(index):
+        with tracing.span("encode.segment", index=index, frames=10):
+            process = subprocess.Popen(BUSY)
+            while tracing.poll(process) is None:
+                time.sleep(0.01)
+
+    threads = [threading.Thread(target=encode, args=(index,)) for index in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    total = tracing.summary()["spans"]["encode.segment"]
+    assert total["children"] == 3
+    assert 0.75 <= total["child_cpu_s"] < 1.5  # Each span has only its own child, not the others'
+    # The three spans overlapped, so their wall time is counted once
+    assert total["wall_s"] < total["busy_s"]
+    assert total["fps"] == round(30 / total["wall_s"], 1)
+
+def test_covered_seconds_merges_overlaps():
+    assert tracing.covered_seconds([(0, 2), (1, 3), (5, 6)]) == 4
+    assert tracing.covered_seconds([]) == 0
+
+def test_imports_and_summarizes_without_rusage(monkeypatch, capsys):
+    # No `resource` module on Windows
+    script = "import sys\nsys.modules['resource'] = None\nimport tracing\nprint(tracing.resource)"
+    result = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(tracing.__file__)),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    assert result.returncode == 0 and result.stdout.strip() == "None", result.stderr
+
+    monkeypatch.setattr(tracing, "resource", None)
+    tracing.reset()
+    with tracing.span("encode"):
+        pass
+    tracing.merge(([], {}, tracing.peak_rss_bytes()))
+    run_summary = tracing.summary()
+    assert "peak_rss_mb" not in run_summary and "encode" in run_summary["spans"]
+    tracing.print_summary(run_summary)
+    assert "Run took" in capsys.readouterr().out
@@ -0,0 +1,116 @@
+import os
+from functools import lru_cache
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+# ImageMagick font names used by the old TextClips -> font files to look for
+FONT_FILES = {
+    "Arial-Bold": ["arialbd.ttf", "Arial Bold.ttf", "Arial_Bold.ttf", "Arial-Bold.ttf", "LiberationSans-Bold.ttf",
+                   "DejaVuSans-Bold.ttf"],
+    "Arial": ["arial.ttf", "Arial.ttf", "LiberationSans-Regular.ttf", "DejaVuSans.ttf"],
+}
+
+FONT_DIRS = [
+    "/usr/share/fonts",
+    "/usr/local/share/fonts",
+    os.path.expanduser("~/.fonts"),
+    "/Library/Fonts",
+    "/System/Library/Fonts",
+    "C:\\Windows\\Fonts",
+]
+
+MIN_LABEL_SCALE = 0.6  # A label is shrunk at most to this fraction of its font size before it wraps
+
+@lru_cache(maxsize=None)
+def find_font_file(font):
+    """ Resolve a font name (or path) to a font file on this machine, or None """
+    if os.path.exists(font):
+        return font
+
+    candidates = FONT_FILES.get(font, [font + ".ttf"])
+    for directory in FONT_DIRS:
+        if not os.path.isdir(directory):
+            continue
+        for root, _, files in os.walk(directory):
+            for candidate in candidates:
+                if candidate in files:
+                    return os.path.join(root, candidate)
+    return None
+
+@lru_cache(maxsize=64)
+def load_font(font, fontsize):
+    """ Load a font at a pixel size, falling back to Pillow's built-in font """
+    path = find_font_file(font)
+    if path:
+        return ImageFont.truetype(path, fontsize)
+    print(f"⚠ Font {font} not found, using the default font.")
+    return ImageFont.load_default(fontsize)
+
+def wrap_text(text, font, max_width):
+    """ Greedy word wrap so every line fits in max_width pixels """
+    lines = []
+    for paragraph in text.split("\n"):
+        current = ""
+        for word in paragraph.split():
+            candidate = f"{current} {word}".strip()
+            if current and font.getlength(candidate) > max_width:
+                lines.append(current)
+                current = word
+            else:
+                current = candidate
+        lines.append(current)
+    return lines
+
+def render_text(text, fontsize=50, color="white", font="Arial-Bold", stroke_color="black", stroke_width=0,
+                method="caption", size=(None, None)):
+    """
+    Rasterize text to an RGBA NumPy sprite (height, width, 4) in-process, mirroring TextClip's options:
+    method="caption" wraps to size[0] pixels, method="label" keeps a single line; lines are centred.
+    A label wider than size[0] is shrunk to fit, down to MIN_LABEL_SCALE of fontsize, and wrapped beyond that.
+    """
+    pil_font = load_font(font, fontsize)
+    box_width = size[0]
+
+    if method == "caption" and box_width:
+        lines = wrap_text(text, pil_font, box_width - 2 * stroke_width)
+    else:
+        lines = [" ".join(text.split())]
+        if box_width:
+            available = box_width - 2 * stroke_width
+            smallest = max(int(fontsize * MIN_LABEL_SCALE), 1)
+            while pil_font.getlength(lines[0]) > available and fontsize > smallest:
+                fontsize = max(min(int(fontsize * available / pil_font.getlength(lines[0])), fontsize - 1),
+                               smallest)
+                pil_font = load_font(font, fontsize)
+            if pil_font.getlength(lines[0]) > available:
+                lines = wrap_text(text, pil_font, available)
+
+    ascent, descent = pil_font.getmetrics()
+    line_height = ascent + descent
+    text_width = max((pil_font.getlength(line) for line in lines), default=0)
+    width = int(box_width or (text_width + 2 * stroke_width))
+    height = int(size[1] or (line_height * len(lines) + 2 * stroke_width))
+
+    image = Image.new("RGBA", (max(width, 1), max(height, 1)), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    fill = ImageColor.getrgb(color)
+    stroke_fill = ImageColor.getrgb(stroke_color) if stroke_color else None
+
+    y = (height - line_height * len(lines)) / 2
+    for line in lines:
+        x = (width - pil_font.getlength(line)) / 2
+        draw.text((x, y), line, font=pil_font, fill=fill,
+                  stroke_width=stroke_width if stroke_fill else 0, stroke_fill=stroke_fill)
+        y += line_height
+
+    return np.asarray(image)
+
+def text_clip(text, **style):
+    """
+    Drop-in replacement for moviepy's TextClip built from a render_text sprite (alpha becomes the mask).
+    Sprites come from the caption cache, so identical captions are only rasterized once.
+    """
+    from moviepy.video.VideoClip import ImageClip
+    from caption_cache import get_sprite
+
+    return ImageClip(get_sprite(text, **style))
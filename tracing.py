@@ -0,0 +1,293 @@
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+try:
+    import resource
+except ImportError:  # Windows: no rusage, so no peak RSS figures
+    resource = None
+
+# Spans recorded in this process, as Chrome trace "complete" events
+_events = []
+_tallies = {}
+_worker_peaks = []  # Peak RSS (bytes) of worker processes whose spans were merged in
+_lock = threading.Lock()
+_local = threading.local()  # Child-process totals of the spans open on each thread
+
+def _forget_parent():
+    """ A forked worker starts with a copy of the parent's spans; drop them so they aren't merged back twice """
+    global _lock
+    _lock = threading.Lock()
+    _events.clear()
+    _tallies.clear()
+    _worker_peaks.clear()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_parent)
+
+def ensure_dir(directory):
+    """ Ensure that a directory exists """
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+def io_counters():
+    """
+    (read_bytes, write_bytes) this thread has caused to hit storage, or (0, 0) where /proc is missing.
+    Per thread, so spans running at the same time on other threads don't count each other's I/O.
+    """
+    try:
+        with open("/proc/thread-self/io", "r") as f:
+            fields = dict(line.split(":", 1) for line in f)
+        return int(fields["read_bytes"]), int(fields["write_bytes"])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+def rss_bytes(maxrss):
+    """ ru_maxrss is KB on Linux, bytes on macOS """
+    return maxrss if platform.system() == "Darwin" else maxrss * 1024
+
+def peak_rss_bytes():
+    """ High-water mark of this process's resident memory since it started (not per span), or None without rusage """
+    if resource is None:
+        return None
+    return rss_bytes(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+def _open_spans():
+    if not hasattr(_local, "spans"):
+        _local.spans = []
+    return _local.spans
+
+def record_child(usage):
+    """ Charge one reaped child's CPU time and peak RSS (its rusage from wait4) to every span open on this thread """
+    cpu = usage.ru_utime + usage.ru_stime
+    peak = rss_bytes(usage.ru_maxrss)
+    for totals in _open_spans():
+        totals["children"] += 1
+        totals["child_cpu_s"] += cpu
+        totals["child_peak_rss_bytes"] = max(totals["child_peak_rss_bytes"], peak)
+
+def poll(process):
+    """ process.poll(), but a child that has exited is reaped with wait4 and measured """
+    if process.returncode is not None or not hasattr(os, "wait4"):
+        return process.poll()
+    pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+    if pid == 0:
+        return None
+    process.returncode = os.waitstatus_to_exitcode(status)
+    record_child(usage)
+    return process.returncode
+
+def wait(process):
+    """ process.wait(), but the child is reaped with wait4 and measured """
+    if process.returncode is not None or not hasattr(os, "wait4"):
+        return process.wait()
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    record_child(usage)
+    return process.returncode
+
+def run(command, stdout=None, stderr=None, **popen_kwargs):
+    """ subprocess.run() for a child process (ffmpeg) whose own CPU time and peak RSS go into the open spans """
+    outputs = {}
+    with subprocess.Popen(command, stdout=stdout, stderr=stderr, **popen_kwargs) as process:
+        # Drain both pipes (like communicate) without letting Popen reap the child before wait4 can
+        readers = [threading.Thread(target=lambda name=name, stream=stream: outputs.update({name: stream.read()}))
+                   for name, stream in (("stdout", process.stdout), ("stderr", process.stderr)) if stream]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+        wait(process)
+    return subprocess.CompletedProcess(command, process.returncode, outputs.get("stdout"), outputs.get("stderr"))
+
+@contextmanager
+def span(name, **args):
+    """
+    Record a span around a block: wall time, CPU time of this thread, CPU time and peak RSS of the child
+    processes run through run()/wait()/poll() on this thread during it, and bytes this thread read/wrote.
+    Extra keyword args (and anything the block adds to the yielded dict) go into the trace event; a `frames`
+    arg also gets the achieved frames per second.
+    """
+    started = time.time()
+    cpu_started = time.thread_time()
+    read_started, written_started = io_counters()
+    children = {"children": 0, "child_cpu_s": 0.0, "child_peak_rss_bytes": 0}
+    _open_spans().append(children)
+    try:
+        yield args
+    finally:
+        _open_spans().pop()  # Spans on one thread nest, so this one is innermost
+        read_bytes, written_bytes = io_counters()
+        wall = time.time() - started
+        if "frames" in args and wall > 0:
+            args["fps"] = round(args["frames"] / wall, 1)
+        event = {
+            "name": name,
+            "cat": name.split(".", 1)[0],
+            "ph": "X",
+            "ts": int(started * 1e6),
+            "dur": int(wall * 1e6),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": dict(args,
+                         cpu_s=round(time.thread_time() - cpu_started, 4),
+                         children=children["children"],
+                         child_cpu_s=round(children["child_cpu_s"], 4),
+                         child_peak_rss_mb=round(children["child_peak_rss_bytes"] / 2 ** 20, 1),
+                         read_bytes=read_bytes - read_started,
+                         write_bytes=written_bytes - written_started),
+        }
+        with _lock:
+            _events.append(event)
+
+def traced(name):
+    """ Decorator form of span() """
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def tally(name, seconds, count=1):
+    """
+    Add to a running total for work too fine-grained for one span each (e.g. compositing a frame).
+    Tallies show up in the run summary.
+    """
+    with _lock:
+        total = _tallies.setdefault(name, {"count": 0, "seconds": 0.0})
+        total["count"] += count
+        total["seconds"] += seconds
+
+def reset():
+    """ Forget everything recorded so far (start of a run) """
+    with _lock:
+        _events.clear()
+        _tallies.clear()
+        _worker_peaks.clear()
+
+def take_worker_events(parent_pid):
+    """
+    In a worker process, hand over (and forget) what was recorded so parent_pid can merge() it, along with
+    the worker's peak RSS; called in parent_pid itself (a thread) this returns nothing, since the events are
+    already in place.
+    """
+    if os.getpid() == parent_pid:
+        return None
+    with _lock:
+        taken = (list(_events), dict(_tallies), peak_rss_bytes())
+        _events.clear()
+        _tallies.clear()
+    return taken
+
+def merge(taken):
+    """ Add events, tallies and the peak RSS handed over by take_worker_events() """
+    if not taken:
+        return
+    events, tallies, peak = taken
+    with _lock:
+        _events.extend(events)
+        if peak is not None:
+            _worker_peaks.append(peak)
+        for name, total in tallies.items():
+            mine = _tallies.setdefault(name, {"count": 0, "seconds": 0.0})
+            mine["count"] += total["count"]
+            mine["seconds"] += total["seconds"]
+
+def covered_seconds(intervals):
+    """ Length of the union of (start, end) intervals, so spans running at the same time count once """
+    covered, reach = 0.0, None
+    for start, end in sorted(intervals):
+        if reach is None or start > reach:
+            covered += end - start
+            reach = end
+        elif end > reach:
+            covered += end - reach
+            reach = end
+    return covered
+
+def summary():
+    """
+    Per-span totals. wall_s is the time at least one span of that name was running (overlapping spans count
+    once; busy_s is the plain sum), CPU seconds add up across threads and children, child_peak_rss_mb is
+    the largest measured child process. peak_rss_mb is this process's high-water mark and
+    worker_peak_rss_mb the largest among worker processes.
+    """
+    with _lock:
+        events = list(_events)
+        tallies = {name: dict(total) for name, total in _tallies.items()}
+        worker_peak = max(_worker_peaks, default=0)
+
+    spans, intervals = {}, {}
+    for event in events:
+        args = event["args"]
+        total = spans.setdefault(event["name"], {"count": 0, "wall_s": 0.0, "busy_s": 0.0, "cpu_s": 0.0,
+                                                 "children": 0, "child_cpu_s": 0.0, "child_peak_rss_mb": 0.0,
+                                                 "read_bytes": 0, "write_bytes": 0})
+        intervals.setdefault(event["name"], []).append((event["ts"] / 1e6, (event["ts"] + event["dur"]) / 1e6))
+        total["count"] += 1
+        total["busy_s"] += event["dur"] / 1e6
+        total["cpu_s"] += args["cpu_s"]
+        total["children"] += args["children"]
+        total["child_cpu_s"] += args["child_cpu_s"]
+        total["child_peak_rss_mb"] = max(total["child_peak_rss_mb"], args["child_peak_rss_mb"])
+        total["read_bytes"] += args["read_bytes"]
+        total["write_bytes"] += args["write_bytes"]
+        if "frames" in args:
+            total["frames"] = total.get("frames", 0) + args["frames"]
+
+    for name, total in spans.items():
+        total["wall_s"] = covered_seconds(intervals[name])
+        for key in ("wall_s", "busy_s", "cpu_s", "child_cpu_s"):
+            total[key] = round(total[key], 3)
+        if total.get("frames") and total["wall_s"] > 0:
+            total["fps"] = round(total["frames"] / total["wall_s"], 1)
+
+    wall = 0.0
+    if events:
+        wall = (max(e["ts"] + e["dur"] for e in events) - min(e["ts"] for e in events)) / 1e6
+    run_summary = {"wall_s": round(wall, 3), "spans": spans, "tallies": tallies}
+    if resource is not None:
+        run_summary["peak_rss_mb"] = round(peak_rss_bytes() / 2 ** 20, 1)
+        run_summary["worker_peak_rss_mb"] = round(worker_peak / 2 ** 20, 1)
+    return run_summary
+
+def print_summary(run_summary=None):
+    """ Print the per-run summary, slowest spans first """
+    run_summary = run_summary or summary()
+    print(f"📊 Run took {run_summary['wall_s']:.1f}s"
+          + (f", peak RSS {run_summary['peak_rss_mb']:.1f} MB" if "peak_rss_mb" in run_summary else "")
+          + (f" (workers {run_summary['worker_peak_rss_mb']:.1f} MB)" if run_summary.get("worker_peak_rss_mb") else ""))
+    spans = sorted(run_summary["spans"].items(), key=lambda item: item[1]["wall_s"], reverse=True)
+    for name, total in spans:
+        print(f"   {name:<24} x{total['count']:<4} {total['wall_s']:8.2f}s wall  "
+              f"{total['cpu_s'] + total['child_cpu_s']:8.2f}s cpu  "
+              f"{total['read_bytes'] / 2 ** 20:7.1f} MB read  {total['write_bytes'] / 2 ** 20:7.1f} MB written"
+              + (f"  {total['child_peak_rss_mb']:7.1f} MB peak/child" if total["children"] else "")
+              + (f"  {total['fps']:.1f} fps" if "fps" in total else ""))
+    for name, total in run_summary["tallies"].items():
+        print(f"   {name:<24} x{total['count']:<4} {total['seconds']:8.2f}s total")
+
+def write_trace(output_file):
+    """ Write everything recorded as Chrome trace JSON (open in chrome://tracing or ui.perfetto.dev) """
+    ensure_dir(os.path.dirname(output_file))
+    with _lock:
+        events = list(_events)
+    tmp_file = f"{output_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    os.replace(tmp_file, output_file)
+    return output_file
+
+def write_summary(output_file, run_summary=None):
+    """ Write the per-run summary as JSON """
+    ensure_dir(os.path.dirname(output_file))
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(run_summary or summary(), f, indent=2)
+    return output_file
@@ -8,6 +8,7 @@ from pydub import AudioSegment
 import os
 from openai import OpenAI  # Import new OpenAI client
 from secrets_ import REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, REDDIT_USER_AGENT
+import llm_cache
 
 # ====== STEP 1: SCRAPE REDDIT STORY ======
 reddit = praw.Reddit(client_id=REDDIT_CLIENT_ID,
@@ -23,27 +24,29 @@ def get_top_story(subreddit="AmItheAsshole"):
         print(f"⚠ Error fetching story: {e}")
         return "No story available at the moment."
 
-story = get_top_story()
-print("Reddit Story Fetched:\n", story)
-
 # ====== STEP 2: FORMAT STORY USING CHATGPT ======
 OPENAI_API_KEY = "your_openai_api_key"
 client = OpenAI(api_key=OPENAI_API_KEY)  # Initialize OpenAI Client
 
-def reformat_story(story_text):
-    prompt = f"""
+PROMPT_TEMPLATE = """
     Rewrite this Reddit story to make it engaging, suspenseful, and suitable for narration:
     \n{story_text}\n"""
+
+def reformat_story(story_text):
+    cached = llm_cache.get("openai", "gpt-4", PROMPT_TEMPLATE, story_text)  # Skip the API call on retries
+    if cached is not None:
+        return cached
+
+    prompt = PROMPT_TEMPLATE.format(story_text=story_text)
     
     response = client.chat.completions.create(  # Updated API call
         model="gpt-4",
         messages=[{"role": "system", "content": "You are a professional storyteller."},
                   {"role": "user", "content": prompt}]
     )
-    return response.choices[0].message.content  # Updated response handling
-
-formatted_story = reformat_story(story)
-print("Formatted Story:\n", formatted_story)
+    formatted = response.choices[0].message.content  # Updated response handling
+    llm_cache.put("openai", "gpt-4", PROMPT_TEMPLATE, story_text, formatted)
+    return formatted
 
 # ====== STEP 3: GENERATE AI VOICEOVER ======
 AUDIO_FILE = "voiceover.mp3"
@@ -52,8 +55,6 @@ def generate_voiceover(text, output_file=AUDIO_FILE):
     tts = gTTS(text, lang="en")
     tts.save(output_file)
 
-generate_voiceover(formatted_story)
-
 # ====== STEP 4: GET STOCK VIDEO BACKGROUND ======
 PEXELS_API_KEY = "your_pexels_api_key"
 PEXELS_VIDEO_QUERY = "cinematic background"
@@ -75,8 +76,6 @@ def get_stock_video():
     
     return video_path
 
-video_path = get_stock_video()
-
 # ====== STEP 5: COMBINE VIDEO + AUDIO ======
 FINAL_VIDEO = "final_video.mp4"
 
@@ -90,8 +89,20 @@ def create_video(background, audio, output_file=FINAL_VIDEO):
     video_clip = video_clip.set_audio(audio_clip)
     video_clip.write_videofile(output_file, fps=24, codec="libx264")
 
-create_video(video_path, AUDIO_FILE)
-print("✅ Video Created Successfully: final_video.mp4")
+# ====== RUN (only when executed directly, so importing this module makes no network calls) ======
+if __name__ == "__main__":
+    story = get_top_story()
+    print("Reddit Story Fetched:\n", story)
+
+    formatted_story = reformat_story(story)
+    print("Formatted Story:\n", formatted_story)
+
+    generate_voiceover(formatted_story)
+
+    video_path = get_stock_video()
+
+    create_video(video_path, AUDIO_FILE)
+    print("✅ Video Created Successfully: final_video.mp4")
 
 
 # import praw
@@ -0,0 +1,176 @@
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import time
+from background_cache import normalize_background
+from download import download_file, file_sha256, get_session
+from fetch_video import VIDEO_QUERY, pick_rendition
+from secrets_ import PEXELS_API_KEY
+
+LIBRARY_DIR = os.path.join("cache", "backgrounds")
+LIBRARY_DB = os.path.join(LIBRARY_DIR, "library.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clips (
+    id INTEGER PRIMARY KEY,
+    pexels_id INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    query TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    fps REAL,
+    duration REAL NOT NULL,
+    codec TEXT,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    added REAL NOT NULL,
+    last_used REAL NOT NULL DEFAULT 0,
+    UNIQUE (pexels_id, file_id)
+);
+CREATE INDEX IF NOT EXISTS clips_select ON clips (query, height, duration);
+CREATE INDEX IF NOT EXISTS clips_sha256 ON clips (sha256);
+"""
+
+def ensure_dir(directory):
+    """ Ensure that a directory exists """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+def connect(db_path=LIBRARY_DB):
+    """ Open the library database, creating the schema if needed """
+    ensure_dir(os.path.dirname(db_path) or ".")
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def probe_clip(path):
+    """ Return (duration, codec, fps) of a local clip using ffprobe """
+    command = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name,avg_frame_rate:format=duration",
+        "-of", "json", path
+    ]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    info = json.loads(result.stdout or "{}")
+    stream = (info.get("streams") or [{}])[0]
+
+    fps = None
+    num, _, den = stream.get("avg_frame_rate", "").partition("/")
+    if num.isdigit() and den.isdigit() and int(den):
+        fps = int(num) / int(den)
+
+    duration = float(info.get("format", {}).get("duration", 0) or 0)
+    return duration, stream.get("codec_name"), fps
+
+def prefetch(query=VIDEO_QUERY, pages=1, per_page=40, target_height=720, library_dir=LIBRARY_DIR, db_path=LIBRARY_DB,
+             normalize=False):
+    """
+    Download many search results into the local library, keeping only the smallest rendition
+    at or above target_height for each video, and index them in SQLite.
+    With normalize=True each clip is also transcoded into the normalized-background cache up front.
+    """
+    ensure_dir(library_dir)
+    conn = connect(db_path)
+    session = get_session()
+    headers = {"Authorization": PEXELS_API_KEY}
+    added = 0
+
+    for page in range(1, pages + 1):
+        print(f"📹 Searching Pexels for '{query}' (page {page})...")
+        try:
+            response = session.get("https://api.pexels.com/videos/search", headers=headers, timeout=30,
+                                   params={"query": query, "per_page": per_page, "page": page}).json()
+        except Exception as e:
+            print(f"⚠ Error searching videos: {e}")
+            break
+
+        videos = response.get("videos", [])
+        if not videos:
+            break
+
+        for video in videos:
+            rendition = pick_rendition(video.get("video_files", []), target_height)
+            if rendition is None:
+                continue
+
+            known = conn.execute("SELECT 1 FROM clips WHERE pexels_id = ? AND file_id = ?",
+                                 (video["id"], rendition.get("id", 0))).fetchone()
+            if known:
+                continue
+
+            path = os.path.join(library_dir, f"{video['id']}_{rendition.get('id', 0)}.mp4")
+            try:
+                download_file(rendition["link"], path, expected_size=rendition.get("size"))
+            except Exception as e:
+                print(f"⚠ Error downloading video {video['id']}: {e}")
+                continue
+
+            duration, codec, fps = probe_clip(path)
+            sha256 = file_sha256(path)
+            conn.execute(
+                "INSERT OR IGNORE INTO clips (pexels_id, file_id, path, query, width, height, fps, duration, "
+                "codec, size, sha256, added) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (video["id"], rendition.get("id", 0), path, query, rendition.get("width") or 0, rendition["height"],
+                 fps or rendition.get("fps"), duration or video.get("duration", 0), codec,
+                 os.path.getsize(path), sha256, time.time()),
+            )
+            conn.commit()
+            added += 1
+
+            if normalize:
+                normalize_background(path, height=target_height, source_hash=sha256)
+
+    conn.close()
+    print(f"✅ Added {added} clips to the background library")
+    return added
+
+def select_clip(min_duration, target_height=720, query=VIDEO_QUERY, db_path=LIBRARY_DB):
+    """
+    Pick a local clip: the smallest rendition at or above target_height that is long enough to avoid
+    looping, preferring the least recently used. Falls back to the longest suitable clip.
+    Returns (path, sha256) so callers can key derived files on the clip's content, or (None, None).
+    """
+    if not os.path.exists(db_path):
+        return None, None
+
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT id, path, sha256 FROM clips WHERE query = ? AND height >= ? AND duration >= ? "
+            "ORDER BY height, last_used LIMIT 10",
+            (query, target_height, min_duration),
+        ).fetchall()
+        if not rows:
+            rows = conn.execute(
+                "SELECT id, path, sha256 FROM clips WHERE query = ? AND height >= ? "
+                "ORDER BY duration DESC, height LIMIT 10",
+                (query, target_height),
+            ).fetchall()
+
+        for row in rows:
+            if os.path.exists(row["path"]):
+                conn.execute("UPDATE clips SET last_used = ? WHERE id = ?", (time.time(), row["id"]))
+                conn.commit()
+                return row["path"], row["sha256"]
+            conn.execute("DELETE FROM clips WHERE id = ?", (row["id"],))
+            conn.commit()
+        return None, None
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prefetch stock backgrounds into the local library")
+    parser.add_argument("query", nargs="?", default=VIDEO_QUERY)
+    parser.add_argument("--pages", type=int, default=1)
+    parser.add_argument("--per-page", type=int, default=40)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--normalize", action="store_true", help="Also pre-fill the normalized-background cache")
+    args = parser.parse_args()
+
+    prefetch(args.query, pages=args.pages, per_page=args.per_page, target_height=args.height,
+             normalize=args.normalize)